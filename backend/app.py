@@ -1,31 +1,37 @@
 # backend/app.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from langchain_pinecone import PineconeVectorStore  # Updated import
-from langchain.chains import RetrievalQA
-from langgraph.prebuilt import create_react_agent
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, ConfigDict, Field
+from langchain_core.prompts import PromptTemplate
 from langchain_core.tools import Tool
-from voyageai import Client as VoyageClient
 from dotenv import load_dotenv
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 import logging
-import pinecone
-from pinecone import Pinecone
 import asyncio
 import httpx
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import Optional, Dict, Any, List
-from datetime import datetime
-from fastapi.responses import Response
+from typing import Annotated, Optional, Dict, Any, List, Tuple
+import re
+import unicodedata
+import weakref
+import bisect
+import functools
+import heapq
+from types import MappingProxyType
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
+import orjson
+import numpy as np
+
+# Shared serializer for hand-rolled JSON (SSE events, pre-encoded payloads)
+_dumps = orjson.dumps
 
 # Conditional imports for testing vs production
 try:
     from cache_service import cache_service
     from connection_pool import PineconeConnectionPool, pinecone_pool
-    from embeddings_service import OptimizedEmbeddingsService, embeddings_service
+    from embeddings_service import OptimizedEmbeddingsService, EmbeddingBatcher, embeddings_service
     from performance_monitor import PerformanceMonitor, performance_monitor
     from observability_service_simple import observability
     PERFORMANCE_SERVICES_AVAILABLE = True
@@ -45,6 +51,9 @@ except ImportError as e:
 
 from response_quality_monitor import response_quality_monitor
 import time
+import random
+import math
+import hashlib
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -52,8 +61,16 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Thread pool for CPU-bound operations
-thread_pool = ThreadPoolExecutor(max_workers=10)
+# Thread pool for the blocking network calls (sync retriever, Pinecone REST,
+# Voyage embeddings). Workers mostly wait on IO, so it uses the stdlib
+# default sizing of cpu_count + 4 capped at 32, overridable via env. The QA
+# chain and the agent run on LangChain's native async paths and need no pool.
+IO_POOL_WORKERS = int(os.getenv(
+    "BACKEND_IO_WORKERS",
+    os.getenv("RETRIEVER_POOL_SIZE", min(32, (os.cpu_count() or 1) + 4))
+))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="io")
 
 # HTTP client for async operations
 http_client: Optional[httpx.AsyncClient] = None
@@ -61,7 +78,7 @@ http_client: Optional[httpx.AsyncClient] = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup and cleanup on shutdown"""
-    global http_client, pinecone_pool, embeddings_service
+    global http_client, pinecone_pool, embeddings_service, pinecone_async_index
     
     logger.info("Starting LegisSync backend with RAG optimizations...")
     
@@ -82,6 +99,28 @@ async def lifespan(app: FastAPI):
         )
         logger.info("✅ Pinecone connection pool initialized")
     
+    # Without gRPC, query over Pinecone's asyncio REST client instead of the thread pool
+    if pinecone_index_host and not use_grpc_queries:
+        try:
+            pinecone_async_index = pc.IndexAsyncio(host=pinecone_index_host)
+            logger.info("✅ Pinecone asyncio index client opened")
+        except Exception as e:
+            logger.warning(f"⚠️ Pinecone asyncio client unavailable (pinecone[asyncio] not installed?), using thread pool: {e}")
+    
+    # Touch the index before traffic arrives so lazily-loaded segments are hot
+    await warm_pinecone_index(int(os.getenv("PINECONE_WARMUP_QUERIES", "4")))
+    
+    # Build the shared QA chain (and its LangChain imports), the fallback
+    # retriever and the agent graph before the first request
+    try:
+        get_rag_chain()
+        if vectorstore is not None:
+            get_retriever()
+        get_react_agent()
+        logger.info("✅ RAG QA chain and agent prebuilt")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not prebuild RAG QA chain or agent, will retry on first query: {e}")
+    
     # Initialize optimized embeddings service
     voyage_api_key = os.getenv("VOYAGE_API_KEY")
     if voyage_api_key:
@@ -93,16 +132,22 @@ async def lifespan(app: FastAPI):
         )
         logger.info("✅ Optimized embeddings service initialized")
         
-        # Pre-warm cache with common queries (commented out for now)
-        # common_queries = [
-        #     "healthcare bill",
-        #     "education funding", 
-        #     "transportation infrastructure",
-        #     "environmental protection",
-        #     "tax reform"
-        # ]
-        # await embeddings_service.warm_cache(common_queries)
-        # logger.info("✅ Embeddings cache warmed")
+        # Embed the most common queries before traffic arrives: this opens the
+        # Voyage connection and leaves their vectors cached for the first requests
+        if os.getenv("EMBEDDINGS_WARMUP", "true").lower() != "false":
+            await embeddings_service.warm_cache([
+                "healthcare bill",
+                "education funding",
+                "transportation infrastructure",
+                "environmental protection",
+                "tax reform"
+            ])
+    
+    # Opt-in (it spends LLM tokens on every boot): one full embed -> search ->
+    # Gemini round-trip so the first user doesn't pay the Gemini channel setup
+    rag_warmup_query = os.getenv("RAG_WARMUP_QUERY")
+    if rag_warmup_query:
+        await prewarm_rag(rag_warmup_query)
     
     # Initialize HTTP client with connection pooling
     http_client = httpx.AsyncClient(
@@ -117,10 +162,14 @@ async def lifespan(app: FastAPI):
         
         # Initialize OpenTelemetry observability
         observability.instrument_fastapi(app)
+        await observability.start_metrics_drain(interval_seconds=1.0)
         logger.info("✅ OpenTelemetry instrumentation enabled")
     else:
         logger.info("⚠️  Performance services disabled for testing")
     
+    # Services were just (re)configured; rebuild the status snapshot on next request
+    invalidate_optimization_status()
+    
     logger.info("🚀 LegisSync backend fully optimized and ready!")
     logger.info("📊 Monitoring endpoints:")
     logger.info("   • Performance: http://localhost:8000/admin/performance")
@@ -136,58 +185,91 @@ async def lifespan(app: FastAPI):
         await http_client.aclose()
     if pinecone_pool:
         await pinecone_pool.close()
+    if pinecone_async_index is not None:
+        await pinecone_async_index.close()
     if embeddings_service:
         await embeddings_service.close()
     await cache_service.close()
     if PERFORMANCE_SERVICES_AVAILABLE:
         await performance_monitor.stop_monitoring()
-    thread_pool.shutdown(wait=True)
+        await observability.stop_metrics_drain()
+    io_pool.shutdown(wait=True)
     
     logger.info("✅ LegisSync backend shutdown complete")
 
 # Log environment variable status (without exposing the actual keys)
-logger.info(f"PINECONE_API_KEY present: {bool(os.getenv('PINECONE_API_KEY'))}")
-logger.info(f"VOYAGE_API_KEY present: {bool(os.getenv('VOYAGE_API_KEY'))}")
-logger.info(f"GOOGLE_API_KEY present: {bool(os.getenv('GOOGLE_API_KEY'))}")
-logger.info(f"Index name: {os.getenv('PINECONE_INDEX_NAME', 'bills-index-dev')}")
+# The environment is fixed for the life of the process, so it is read once here
+# and reused by /debug/status instead of on every call
+_CONFIG_STATUS = {
+    "pinecone_api_key": bool(os.getenv("PINECONE_API_KEY")),
+    "voyage_api_key": bool(os.getenv("VOYAGE_API_KEY")),
+    "google_api_key": bool(os.getenv("GOOGLE_API_KEY")),
+    "index_name": os.getenv("PINECONE_INDEX_NAME", "bills-index-dev")
+}
+logger.info(f"PINECONE_API_KEY present: {_CONFIG_STATUS['pinecone_api_key']}")
+logger.info(f"VOYAGE_API_KEY present: {_CONFIG_STATUS['voyage_api_key']}")
+logger.info(f"GOOGLE_API_KEY present: {_CONFIG_STATUS['google_api_key']}")
+logger.info(f"Index name: {_CONFIG_STATUS['index_name']}")
 
-app = FastAPI(lifespan=lifespan)
+# orjson serializes the large /rag payloads several times faster than stdlib json
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Add observability middleware early (only if services are available)
 if PERFORMANCE_SERVICES_AVAILABLE:
     observability_middleware = observability.get_middleware()
     if observability_middleware:
-        app.middleware("http")(observability_middleware)
+        app.add_middleware(observability_middleware)
         logger.info("✅ Observability middleware added")
 else:
     logger.info("⚠️  Observability middleware skipped for testing")
 
+# Pre-bound metric recorders for label sets that never change, so hot paths
+# skip the per-call label lookup (the mock service has no bind_metric)
+def _bind_metric(metric_name: str, labels: dict):
+    return observability.bind_metric(metric_name, labels) or (lambda value=1: None)
+
+_HEALTH_OK = _bind_metric("health_check_total", {"status": "success"})
+_RAG_HIT_DURATION = _bind_metric("rag_query_duration_ms", {"cache_hit": "true"})
+_RAG_MISS_DURATION = _bind_metric("rag_query_duration_ms", {"cache_hit": "false"})
+_RAG_CACHE_HITS = _bind_metric("cache_hits_total", {"endpoint": "/rag"})
+_RAG_DOCUMENTS_FOUND = _bind_metric("rag_documents_found", {"query_type": "vector_search"})
+
+# Only the timestamp and cache stats change between health checks, so the rest
+# of the body is serialized once and the dynamic fields are spliced in
+_HEALTH_TEMPLATE = (
+    b'{"status":"healthy","service":"legisync-backend","timestamp":"%s",'
+    b'"version":"1.0.0","cache_stats":%s}'
+)
+
+# Load balancers and probes poll /health every second or so; the timestamp has
+# second resolution, so the whole body is rebuilt at most once per second
+_health_cache = [0, b""]
+
+async def _health_body() -> bytes:
+    now = int(time.time())
+    if now != _health_cache[0]:
+        cache_stats = await cache_service.get_cache_stats()
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)).encode()
+        _health_cache[:] = [now, _HEALTH_TEMPLATE % (timestamp, _dumps(cache_stats))]
+    return _health_cache[1]
+
 # Health check endpoint with cache stats
 @app.get("/health")
 async def health_check():
-    cache_stats = await cache_service.get_cache_stats()
-    return {
-        "status": "healthy", 
-        "service": "legisync-backend",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": "1.0.0",
-        "cache_stats": cache_stats
-    }
+    _HEALTH_OK()
+    return Response(content=await _health_body(), media_type="application/json")
 
 # Debug endpoint to check system status
 @app.get("/debug/status")
 async def debug_status():
     cache_stats = await cache_service.get_cache_stats()
-    return {
-        "pinecone_api_key": bool(os.getenv("PINECONE_API_KEY")),
-        "voyage_api_key": bool(os.getenv("VOYAGE_API_KEY")),
-        "google_api_key": bool(os.getenv("GOOGLE_API_KEY")),
-        "index_name": os.getenv("PINECONE_INDEX_NAME", "bills-index-dev"),
+    return ORJSONResponse({
+        **_CONFIG_STATUS,
         "vectorstore_initialized": vectorstore is not None,
         "pinecone_client_initialized": pc is not None,
         "cache_service": cache_stats,
         "http_client_active": http_client is not None
-    }
+    })
 
 # Add CORS middleware
 app.add_middleware(
@@ -204,17 +286,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (answers, admin stats, metrics exports) on the way
+# to Vercel; SSE streams are excluded by Starlette so tokens aren't held back.
+# Level 5 keeps most of the size win at a fraction of level 9's CPU cost
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Request models for API endpoints
+# Upper bound on query length: anything longer is rejected by pydantic-core
+# with a 422 before it costs an embedding, a vector search and LLM tokens
+MAX_QUERY_LENGTH = int(os.getenv("MAX_QUERY_LENGTH", "4000"))
+
 class QueryRequest(BaseModel):
-    query: str
+    model_config = ConfigDict(extra="forbid")
+    
+    query: str = Field(max_length=MAX_QUERY_LENGTH)
+    stream: bool = False
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "16"))
+
+class BatchQueryRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    
+    queries: List[Annotated[str, Field(max_length=MAX_QUERY_LENGTH)]] = Field(min_length=1, max_length=MAX_BATCH_QUERIES)
+
+class ChainResult(BaseModel):
+    """Post-processed answer from the QA chain"""
+    result: str
+    source_documents: List[Any] = []
 
 # Configure tracing only when not in test mode
 is_testing = os.getenv("TESTING", "false").lower() == "true" or "pytest" in os.environ.get("_", "")
 
-if not is_testing:
+# Decided once at import: with tracing switched off, langsmith's wrapper would
+# still re-check the tracing env and build run context on every request
+tracing_enabled = any(
+    os.getenv(var, "").lower() == "true"
+    for var in ("LANGSMITH_TRACING", "LANGCHAIN_TRACING_V2", "LANGCHAIN_TRACING")
+)
+
+if not is_testing and tracing_enabled:
     from langsmith import traceable
 else:
-    # Create a no-op traceable decorator for testing
+    # Create a no-op traceable decorator for testing or when tracing is off
     def traceable(func):
         return func
 
@@ -222,6 +335,7 @@ else:
 pc = None
 if not os.getenv("TESTING") and os.getenv("PINECONE_API_KEY"):
     try:
+        from pinecone import Pinecone
         pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
         logger.info("Pinecone client initialized successfully")
     except Exception as e:
@@ -237,8 +351,11 @@ vo = None
 model = None
 if not os.getenv("TESTING"):
     try:
+        from voyageai import Client as VoyageClient
+        from langchain_google_genai import ChatGoogleGenerativeAI
         vo = VoyageClient(api_key=os.getenv("VOYAGE_API_KEY"))
-        model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=os.getenv("GOOGLE_API_KEY"))
+        # gRPC transport keeps one long-lived HTTP/2 channel for all Gemini calls
+        model = ChatGoogleGenerativeAI(model="gemini-1.5-flash", api_key=os.getenv("GOOGLE_API_KEY"), transport="grpc")
         logger.info("API clients initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize API clients: {e}")
@@ -248,12 +365,17 @@ else:
 # Create mock clients for testing
 if vo is None:
     class MockVoyageClient:
+        def _dummy_embedding(self, text):
+            # Deterministic per-text vector so semantic cache lookups behave realistically
+            rng = random.Random(hashlib.md5(str(text).encode()).hexdigest())
+            return [rng.uniform(-1.0, 1.0) for _ in range(1024)]
+
         def embed(self, texts, **kwargs):
             # Return dummy embeddings for testing
             if isinstance(texts, list):
-                return [[0.1] * 1024 for _ in texts]  # 1024-dim dummy embeddings
+                return [self._dummy_embedding(text) for text in texts]  # 1024-dim dummy embeddings
             else:
-                return [0.1] * 1024
+                return self._dummy_embedding(texts)
     vo = MockVoyageClient()
 
 if model is None:
@@ -262,43 +384,132 @@ if model is None:
             return "This is a mock response for testing purposes."
         def __call__(self, prompt, **kwargs):
             return "This is a mock response for testing purposes."
+        async def astream(self, prompt, **kwargs):
+            yield "This is a mock response for testing purposes."
     model = MockLLM()
 
 index_name = os.getenv("PINECONE_INDEX_NAME", "bills-index-dev")
 
+# Must match the dtype and Matryoshka dimension the index was ingested with
+# ("float"/"int8"; 256/512/1024/2048, unset for the model default)
+VOYAGE_OUTPUT_DTYPE = os.getenv("VOYAGE_OUTPUT_DTYPE", "float")
+VOYAGE_OUTPUT_DIMENSION = int(os.getenv("VOYAGE_OUTPUT_DIMENSION") or 0) or None
+
+# Document embedding requests are split to stay under voyage-3.5's per-request
+# limits, and at most VOYAGE_BATCH_CONCURRENCY of them are in flight at once
+VOYAGE_BATCH_MAX_TEXTS = int(os.getenv("VOYAGE_BATCH_MAX_TEXTS", "128"))
+VOYAGE_BATCH_MAX_TOKENS = int(os.getenv("VOYAGE_BATCH_MAX_TOKENS", "120000"))
+VOYAGE_BATCH_CONCURRENCY = int(os.getenv("VOYAGE_BATCH_CONCURRENCY", "5"))
+
 logger.info(f"Initializing Pinecone with index: {index_name}")
 
 # Create a proper embedding function for langchain
 from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
 from typing import List
 
 class VoyageEmbeddings(Embeddings):
     def __init__(self, client):
         self.client = client
+        # Coalesces concurrent async query embeddings into batched Voyage calls;
+        # the window trades a few ms of latency for fewer round-trips under load
+        self.query_batcher = (
+            EmbeddingBatcher(
+                lambda texts: self._embed(texts, "query"),
+                executor=io_pool,
+                max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "64")),
+                max_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "10"))
+            )
+            if PERFORMANCE_SERVICES_AVAILABLE else None
+        )
+    
+    def _embed(self, texts: List[str], input_type: str) -> List[List[float]]:
+        result = self.client.embed(
+            texts, model="voyage-3.5", input_type=input_type,
+            output_dtype=VOYAGE_OUTPUT_DTYPE, output_dimension=VOYAGE_OUTPUT_DIMENSION
+        )
+        # Real VoyageClient returns an EmbeddingsObject, the mock client plain lists
+        return result.embeddings if hasattr(result, 'embeddings') else result
+    
+    def _document_batches(self, texts: List[str]) -> List[List[str]]:
+        """Greedily pack texts, in order, under the Voyage per-request count and token caps"""
+        batches = []
+        batch, batch_tokens = [], 0
+        for text in texts:
+            # Voyage tokens run ~3-4 characters; 3 keeps the estimate on the safe side
+            text_tokens = len(text) // 3 + 1
+            if batch and (len(batch) >= VOYAGE_BATCH_MAX_TEXTS or batch_tokens + text_tokens > VOYAGE_BATCH_MAX_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += text_tokens
+        if batch:
+            batches.append(batch)
+        return batches
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        if hasattr(self.client, 'embed') and hasattr(self.client.embed(texts), 'embeddings'):
-            # Real VoyageClient
-            return self.client.embed(texts, model="voyage-3.5", input_type="document").embeddings
-        else:
-            # Mock client
-            return self.client.embed(texts)
+        embeddings = []
+        for batch in self._document_batches(texts):
+            embeddings.extend(self._embed(batch, "document"))
+        return embeddings
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Batches go out concurrently on the sized IO pool (rather than the loop's
+        # default executor LangChain's base class would use), a few at a time
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(VOYAGE_BATCH_CONCURRENCY)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await loop.run_in_executor(io_pool, self._embed, batch, "document")
+        
+        results = await asyncio.gather(*[embed_batch(batch) for batch in self._document_batches(texts)])
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
     
     def embed_query(self, text: str) -> List[float]:
-        if hasattr(self.client, 'embed') and hasattr(self.client.embed([text]), 'embeddings'):
-            # Real VoyageClient
-            return self.client.embed([text], model="voyage-3.5", input_type="query").embeddings[0]
-        else:
-            # Mock client
-            result = self.client.embed([text])
-            return result[0] if isinstance(result, list) else result
+        return self._embed([text], "query")[0]
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.query_batcher is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(io_pool, self.embed_query, text)
+        return await self.query_batcher.submit(text)
 
 embeddings = VoyageEmbeddings(vo)
 
+def open_pinecone_index(index_name: str):
+    """Open the index by host (resolved once) over gRPC, falling back to REST"""
+    # PINECONE_INDEX_HOST skips the describe_index round-trip entirely
+    index_host = os.getenv("PINECONE_INDEX_HOST") or pc.describe_index(index_name).host
+    try:
+        from pinecone.grpc import PineconeGRPC
+        index = PineconeGRPC(api_key=os.getenv("PINECONE_API_KEY")).Index(host=index_host)
+        logger.info(f"Pinecone gRPC index client targeting {index_host}")
+        return index, True, index_host
+    except ImportError:
+        # REST queries run on io_pool threads; urllib3 discards connections
+        # beyond the pool size, so keep one keep-alive connection per worker
+        index = pc.Index(
+            host=index_host,
+            connection_pool_maxsize=max(IO_POOL_WORKERS, 5 * (os.cpu_count() or 1))
+        )
+        logger.info(f"⚠️  pinecone[grpc] not installed, using REST index client for {index_host}")
+        return index, False, index_host
+
+# Raw index handle for native async (gRPC future) queries; None in testing mode
+pinecone_index = None
+pinecone_index_host = None
+use_grpc_queries = False
+# asyncio REST client for when gRPC is unavailable; opened in the lifespan
+# because its aiohttp session is bound to the running event loop
+pinecone_async_index = None
+
 # Initialize vectorstore only if not in testing mode
 if not os.getenv("TESTING") and pc:
     try:
-        vectorstore = PineconeVectorStore(index_name=index_name, embedding=embeddings, text_key="text")
+        from langchain_pinecone import PineconeVectorStore
+        pinecone_index, use_grpc_queries, pinecone_index_host = open_pinecone_index(index_name)
+        vectorstore = PineconeVectorStore(index=pinecone_index, embedding=embeddings, text_key="text")
         logger.info("Pinecone vectorstore initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Pinecone vectorstore: {e}")
@@ -314,160 +525,131 @@ else:
     vectorstore = MockVectorStore()
     logger.info("⚠️  Mock vectorstore initialized for testing")
 
-def query_db(bill_id: str) -> dict:
-    return {"bill_id": bill_id, "content": "Mock bill details from DB"}
+# Optional comma-separated namespaces (e.g. one per legislative session); when
+# several are set they are searched in parallel and the best matches merged
+PINECONE_NAMESPACES = [ns.strip() for ns in os.getenv("PINECONE_NAMESPACES", "").split(",") if ns.strip()]
 
-tools = [Tool(name="DBQuery", func=query_db, description="Fetch bill details by ID")]
+# Documents retrieved per query, shared by the direct index search and the
+# LangChain retriever fallback so both paths hand the chain the same context
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
 
-# Create a context manager that works whether tracing is enabled or not
-from contextlib import contextmanager
+# Optional second-stage rerank: pull RAG_RERANK_CANDIDATES matches from the index
+# and keep only the RAG_RERANK_TOP_N that Voyage's reranker scores highest, so the
+# Gemini prompt carries fewer, better documents (0 disables it)
+RAG_RERANK_TOP_N = int(os.getenv("RAG_RERANK_TOP_N", "0"))
+RAG_RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "10"))
+RAG_RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "rerank-2-lite")
 
-@contextmanager
-def optional_span(name: str):
-    # Simplified: no OpenTelemetry tracing, just a passthrough
-    yield
+async def _query_index_matches(query_embedding: List[float], top_k: int, namespace: Optional[str] = None) -> list:
+    """Run one vector query against a single namespace and return its matches"""
+    query_kwargs = {"vector": query_embedding, "top_k": top_k, "include_metadata": True}
+    if namespace:
+        query_kwargs["namespace"] = namespace
+    
+    if use_grpc_queries:
+        # gRPC returns a future, so no thread pool worker is held while waiting
+        response = await asyncio.wrap_future(pinecone_index.query(**query_kwargs, async_req=True))
+    elif pinecone_async_index is not None:
+        response = await pinecone_async_index.query(**query_kwargs)
+    else:
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            io_pool, functools.partial(pinecone_index.query, **query_kwargs)
+        )
+    return response.matches
 
-@app.post("/rag")
-@traceable
-async def rag_query(request: QueryRequest):
-    start_time = time.time()
-    cache_hit = False
-    documents_found = 0
-    error_occurred = False
+async def query_index_async(query_embedding: List[float], top_k: int = RAG_TOP_K) -> List[Document]:
+    """Query the index with an already computed embedding (no re-embedding)"""
+    if len(PINECONE_NAMESPACES) > 1:
+        per_namespace = await asyncio.gather(
+            *[_query_index_matches(query_embedding, top_k, namespace) for namespace in PINECONE_NAMESPACES]
+        )
+        matches = heapq.nlargest(
+            top_k, (match for matches in per_namespace for match in matches), key=lambda match: match.score
+        )
+    else:
+        matches = await _query_index_matches(
+            query_embedding, top_k, PINECONE_NAMESPACES[0] if PINECONE_NAMESPACES else None
+        )
     
-    with optional_span("rag-query"):
-        try:
-            logger.info(f"🔍 Processing query: {request.query}")
-            
-            # Check cache first for immediate response
-            cached_result = await cache_service.get_cached_result(request.query)
-            if cached_result:
-                cache_hit = True
-                documents_found = cached_result.get("documents_found", 0)
-                duration_ms = (time.time() - start_time) * 1000
-                
-                # Record performance metrics
-                performance_monitor.record_request(
-                    endpoint="/rag",
-                    query=request.query,
-                    duration_ms=duration_ms,
-                    cache_hit=True,
-                    documents_found=documents_found,
-                    error=False,
-                    status_code=200
-                )
-                
-                # Record OpenTelemetry observability metrics for cache hit
-                observability.record_custom_metric(
-                    "rag_query_total",
-                    1,
-                    {
-                        "cache_hit": "true",
-                        "status": "success",
-                        "documents_found": str(documents_found)
-                    }
-                )
-                
-                observability.record_custom_metric(
-                    "rag_query_duration_ms",
-                    duration_ms,
-                    {"cache_hit": "true"}
-                )
-                
-                observability.record_custom_metric(
-                    "cache_hits_total",
-                    1,
-                    {"endpoint": "/rag"}
-                )
-                
-                logger.info(f"💾 Cache hit! Returning cached result ({duration_ms:.0f}ms)")
-                return cached_result
-            
-            # Check if vectorstore is available
-            if vectorstore is None:
-                error_occurred = True
-                logger.error("Vectorstore is not initialized")
-                error_result = {
-                    "query": request.query,
-                    "result": "The search service is currently unavailable. Please try again later.",
-                    "error": True
-                }
-                
-                duration_ms = (time.time() - start_time) * 1000
-                performance_monitor.record_request(
-                    endpoint="/rag",
-                    query=request.query,
-                    duration_ms=duration_ms,
-                    cache_hit=False,
-                    documents_found=0,
-                    error=True,
-                    status_code=503
-                )
-                
-                return error_result
-            
-            # Run optimized vector search and LLM processing
-            async def optimized_vector_search():
-                """Optimized async vector search with connection pooling"""
-                if pinecone_pool and embeddings_service:
-                    # Use optimized services
-                    with optional_span("embedding-generation"):
-                        query_embedding = await embeddings_service.embed_query(request.query)
-                    
-                    with optional_span("vector-search-optimized"):
-                        # This would integrate with the connection pool for actual Pinecone queries
-                        # For now, fall back to the existing method
-                        loop = asyncio.get_event_loop()
-                        retriever = vectorstore.as_retriever()
-                        docs = await loop.run_in_executor(thread_pool, retriever.get_relevant_documents, request.query)
-                        return docs
-                else:
-                    # Fallback to original method
-                    loop = asyncio.get_event_loop()
-                    retriever = vectorstore.as_retriever()
-                    docs = await loop.run_in_executor(thread_pool, retriever.get_relevant_documents, request.query)
-                    return docs
-            
-            async def run_chain(docs):
-                """Enhanced async wrapper for chain processing with custom prompts"""
-                if not docs:
-                    # Enhanced no-results response with suggestions
-                    suggestions = [
-                        "Try broader search terms (e.g., 'education' instead of specific program names)",
-                        "Check spelling of bill numbers or legislative terms",
-                        "Search for related topics like 'budget', 'appropriations', or 'reform'",
-                        "Consider different legislative sessions or time periods"
-                    ]
-                    
-                    suggestion_text = "\n• ".join(suggestions)
-                    
-                    return {
-                        "query": request.query,
-                        "result": f"""No specific bills found for your query: "{request.query}"
+    # Mirror PineconeVectorStore: the "text" metadata field becomes page_content
+    docs = []
+    for match in matches:
+        metadata = dict(match.metadata or {})
+        page_content = metadata.pop("text", "")
+        docs.append(Document(page_content=page_content, metadata=metadata))
+    return docs
 
-**Search Suggestions:**
-• {suggestion_text}
+async def rerank_documents(query: str, docs: List[Document]) -> List[Document]:
+    """Keep the RAG_RERANK_TOP_N documents most relevant to the query, best first"""
+    if RAG_RERANK_TOP_N <= 0 or len(docs) <= RAG_RERANK_TOP_N:
+        return docs
+    
+    loop = asyncio.get_running_loop()
+    try:
+        reranking = await loop.run_in_executor(
+            io_pool,
+            functools.partial(
+                vo.rerank, query, [doc.page_content for doc in docs],
+                model=RAG_RERANK_MODEL, top_k=RAG_RERANK_TOP_N
+            )
+        )
+    except Exception as e:
+        # The vector search order is still a sound ranking, just a coarser one
+        logger.warning("⚠️  Rerank failed, keeping vector search order: %s", e)
+        return docs[:RAG_RERANK_TOP_N]
+    return [docs[item.index] for item in reranking.results]
 
-**Popular Topics to Explore:**
-• Education funding and school finance
-• Healthcare and Medicaid policy  
-• Transportation and infrastructure
-• Criminal justice reform
-• Environmental protection
-• Tax policy and property taxes
+async def warm_pinecone_index(num_queries: int = 4, dimension: int = VOYAGE_OUTPUT_DIMENSION or 1024):
+    """Issue throwaway top_k=1 queries so the first real query skips cold segment loads"""
+    if pinecone_index is None or num_queries <= 0:
+        return
+    
+    def random_unit_vector() -> List[float]:
+        vector = [random.gauss(0.0, 1.0) for _ in range(dimension)]
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector]
+    
+    async def warm_query(vector: List[float]):
+        if use_grpc_queries:
+            return await asyncio.wrap_future(
+                pinecone_index.query(vector=vector, top_k=1, async_req=True)
+            )
+        if pinecone_async_index is not None:
+            return await pinecone_async_index.query(vector=vector, top_k=1)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            io_pool, lambda: pinecone_index.query(vector=vector, top_k=1)
+        )
+    
+    start = time.time()
+    results = await asyncio.gather(
+        *[warm_query(random_unit_vector()) for _ in range(num_queries)],
+        return_exceptions=True
+    )
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        logger.warning(f"⚠️ Pinecone warm-up: {len(failures)}/{num_queries} queries failed: {failures[0]}")
+    else:
+        logger.info(f"✅ Pinecone index warmed with {num_queries} queries ({(time.time() - start) * 1000:.0f}ms)")
 
-Try rephrasing your question or using one of these broader topics.""",
-                        "documents_found": 0,
-                        "suggestions_provided": True
-                    }
-                
-                with optional_span("llm-processing"):
-                    loop = asyncio.get_event_loop()
-                    
-                    # Create a clean, properly formatted custom prompt
-                    from langchain.prompts import PromptTemplate
-                    
-                    custom_prompt_template = """You are a helpful legislative research assistant for Texas bills and legislation. 
+def query_db(bill_id: str) -> dict:
+    return {"bill_id": bill_id, "content": "Mock bill details from DB"}
+
+def query_db_batch(bill_ids: str) -> List[dict]:
+    """Look up several bills in one tool call, so the agent spends one turn instead of N"""
+    return [query_db(bill_id.strip()) for bill_id in bill_ids.split(",") if bill_id.strip()]
+
+tools = [
+    Tool(name="DBQuery", func=query_db, description="Fetch bill details by ID"),
+    Tool(
+        name="DBQueryBatch",
+        func=query_db_batch,
+        description="Fetch details for several bills at once; input is comma-separated IDs, e.g. 'HB 1, SB 2'"
+    )
+]
+
+RAG_PROMPT_TEMPLATE = """You are a helpful legislative research assistant for Texas bills and legislation. 
 Based on the following legislative documents, provide a comprehensive and accurate response.
 
 CONTEXT DOCUMENTS:
@@ -487,99 +669,363 @@ If multiple bills are relevant, prioritize by relevance and provide a clear, wel
 
 RESPONSE:"""
 
-                    custom_prompt = PromptTemplate(
-                        input_variables=["context", "question"],
-                        template=custom_prompt_template
-                    )
-                    
-                    retriever = vectorstore.as_retriever()
-                    chain = RetrievalQA.from_chain_type(
-                        llm=model, 
-                        chain_type="stuff",
-                        retriever=retriever,
-                        return_source_documents=True,
-                        chain_type_kwargs={"prompt": custom_prompt}
-                    )
-                    
-                    result = await loop.run_in_executor(thread_pool, chain, {"query": request.query})
-                    
-                    # Enhanced post-processing
-                    if isinstance(result, dict) and "result" in result:
-                        enhanced_result = result["result"]
-                        
-                        # Add session information from document metadata
-                        sessions = set()
-                        bill_numbers = set()
-                        
-                        for doc in docs:
-                            if hasattr(doc, 'metadata'):
-                                if 'session' in doc.metadata:
-                                    sessions.add(doc.metadata['session'])
-                                if 'bill_id' in doc.metadata:
-                                    bill_numbers.add(doc.metadata['bill_id'])
-                        
-                        # Add session context if available (more subtle formatting)
-                        if sessions:
-                            session_text = f"*Legislative Session {', '.join(sorted(sessions))}*\n\n"
-                            enhanced_result = session_text + enhanced_result
-                        
-                        # Format bill numbers consistently (but avoid double formatting)
-                        import re
-                        # Only format bill numbers that aren't already formatted
-                        bill_pattern = r'(?<!\*)\b([HS][BJR])\s*(\d+)\b(?!\*)'
-                        def format_bill(match):
-                            prefix = match.group(1).upper()
-                            number = match.group(2)
-                            return f"**{prefix} {number}**"
-                        enhanced_result = re.sub(bill_pattern, format_bill, enhanced_result, flags=re.IGNORECASE)
-                        
-                        # Add document count context (more subtle)
-                        if len(docs) > 1:
-                            doc_context = f"*Based on {len(docs)} documents*\n\n"
-                            enhanced_result = doc_context + enhanced_result
-                        
-                        result["result"] = enhanced_result
-                        result["enhancement_applied"] = True
-                        result["bill_numbers_found"] = list(bill_numbers)
-                        result["sessions_referenced"] = list(sessions)
-                    
-                    return result
+RAG_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template=RAG_PROMPT_TEMPLATE
+)
+
+_NO_RESULTS_SUGGESTIONS = [
+    "Try broader search terms (e.g., 'education' instead of specific program names)",
+    "Check spelling of bill numbers or legislative terms",
+    "Search for related topics like 'budget', 'appropriations', or 'reform'",
+    "Consider different legislative sessions or time periods"
+]
+
+# Static apart from the query, so it's assembled once rather than on every miss
+NO_RESULTS_TEMPLATE = """No specific bills found for your query: "{query}"
+
+**Search Suggestions:**
+• """ + "\n• ".join(_NO_RESULTS_SUGGESTIONS) + """
+
+**Popular Topics to Explore:**
+• Education funding and school finance
+• Healthcare and Medicaid policy  
+• Transportation and infrastructure
+• Criminal justice reform
+• Environmental protection
+• Tax policy and property taxes
+
+Try rephrasing your question or using one of these broader topics."""
+
+# Only format bill numbers that aren't already formatted
+_BILL_RE = re.compile(r'(?<!\*)\b([HS][BJR])\s*(\d+)\b(?!\*)', re.IGNORECASE)
+
+def _format_bill(match: re.Match) -> str:
+    """Bold a matched bill number in canonical form (e.g. hb55 -> **HB 55**)"""
+    return f"**{match.group(1).upper()} {match.group(2)}**"
+
+# Heavy LangChain/LangGraph modules are imported on first use rather than at
+# module load, which keeps worker cold starts (and test collection) fast
+def load_qa_chain(*args, **kwargs):
+    from langchain.chains.question_answering import load_qa_chain as _load_qa_chain
+    return _load_qa_chain(*args, **kwargs)
+
+def create_react_agent(*args, **kwargs):
+    from langgraph.prebuilt import create_react_agent as _create_react_agent
+    return _create_react_agent(*args, **kwargs)
+
+# The ReAct agent graph holds no per-request state either; compile it once per llm
+_react_agent = None
+_react_agent_owner = None
+
+def get_react_agent():
+    """Return the shared ReAct agent over the bill lookup tools"""
+    global _react_agent, _react_agent_owner
+    if _react_agent is None or _react_agent_owner is not model:
+        _react_agent = create_react_agent(model, tools)
+        _react_agent_owner = model
+    return _react_agent
+
+# The "stuff" QA chain is stateless per request, so build it once per llm
+_rag_chain = None
+_rag_chain_owner = None
+
+def get_rag_chain():
+    """Return the shared QA chain that answers over already-retrieved documents"""
+    global _rag_chain, _rag_chain_owner
+    # Rebuild if the llm has been swapped
+    if _rag_chain is None or _rag_chain_owner is not model:
+        _rag_chain = load_qa_chain(model, chain_type="stuff", prompt=RAG_PROMPT)
+        _rag_chain_owner = model
+    return _rag_chain
+
+# Same for the REST fallback retriever: one per vectorstore instead of one per query
+_retriever = None
+_retriever_owner = None
+
+def get_retriever():
+    """Return the shared LangChain retriever over the current vectorstore"""
+    global _retriever, _retriever_owner
+    if _retriever is None or _retriever_owner is not vectorstore:
+        _retriever = vectorstore.as_retriever(search_kwargs={"k": RAG_TOP_K})
+        _retriever_owner = vectorstore
+    return _retriever
+
+def _enhance_answer(answer: str, docs: List[Any]) -> Dict[str, Any]:
+    """Post-process an LLM answer with session context and consistent bill formatting"""
+    enhanced_result = answer
+    
+    # Add session information from document metadata (single pass, order-preserving)
+    meta = [doc.metadata for doc in docs if hasattr(doc, 'metadata')]
+    sessions = sorted({m.get('session') for m in meta} - {None})
+    bill_numbers = list(dict.fromkeys(m.get('bill_id') for m in meta if m.get('bill_id') is not None))
+    
+    # Add session context if available (more subtle formatting)
+    if sessions:
+        session_text = f"*Legislative Session {', '.join(sessions)}*\n\n"
+        enhanced_result = session_text + enhanced_result
+    
+    # Format bill numbers consistently (but avoid double formatting)
+    enhanced_result = _BILL_RE.sub(_format_bill, enhanced_result)
+    
+    # Add document count context (more subtle)
+    if len(docs) > 1:
+        doc_context = f"*Based on {len(docs)} documents*\n\n"
+        enhanced_result = doc_context + enhanced_result
+    
+    return {
+        "result": enhanced_result,
+        "enhancement_applied": True,
+        "bill_numbers_found": bill_numbers,
+        "sessions_referenced": sessions
+    }
+
+# Keep proxies (nginx, Render's edge) from buffering the stream, which would
+# hold back the first tokens until the whole answer is generated
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    """Format a Server-Sent Events message with a JSON payload, already encoded"""
+    prefix = b"event: %s\n" % event.encode() if event else b""
+    return b"%sdata: %s\n\n" % (prefix, _dumps(data))
+
+def _rag_response(request: QueryRequest, result: Dict[str, Any]):
+    """Return a complete /rag result, as a single SSE event for streaming clients"""
+    if not request.stream:
+        return result
+    
+    async def single_event():
+        # Failures before streaming started use the same event name as mid-stream ones
+        yield _sse_event(result, event="error" if result.get("error") else "final")
+    
+    return StreamingResponse(single_event(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+def _record_rag_cache_hit(query: str, duration_ms: float, documents_found: int, cache_type: str = "exact"):
+    """Record performance and observability metrics for a /rag cache hit ("exact", "semantic" or "inflight")"""
+    performance_monitor.record_request(
+        endpoint="/rag",
+        query=query,
+        duration_ms=duration_ms,
+        cache_hit=True,
+        documents_found=documents_found,
+        error=False,
+        status_code=200
+    )
+    
+    # Record OpenTelemetry observability metrics for cache hit
+    observability.record_custom_metric(
+        "rag_query_total",
+        1,
+        {
+            "cache_hit": "true",
+            "cache_type": cache_type,
+            "status": "success",
+            "documents_found": str(documents_found)
+        }
+    )
+    
+    _RAG_HIT_DURATION(duration_ms)
+    _RAG_CACHE_HITS()
+
+async def embed_query_vector(query: str) -> Optional[List[float]]:
+    """Embed a query once per request (None if embedding is unavailable)"""
+    try:
+        if embeddings_service:
+            return await embeddings_service.embed_query(query)
+        return await embeddings.aembed_query(query)
+    except Exception as e:
+        logger.warning(f"Query embedding failed, skipping semantic cache: {e}")
+        return None
+
+async def prewarm_rag(query: str):
+    """Run the RAG pipeline once, uncached, to open every downstream connection"""
+    warm_start = time.time()
+    try:
+        query_embedding = await embed_query_vector(query)
+        docs = []
+        if pinecone_index is not None and query_embedding is not None:
+            docs = await query_index_async(query_embedding, top_k=1)
+        await get_rag_chain().ainvoke({"input_documents": docs, "question": query})
+        logger.info("✅ RAG pipeline warmed (%.0fms)", (time.time() - warm_start) * 1000)
+    except Exception as e:
+        logger.warning(f"⚠️ RAG warm-up failed, first query will open connections: {e}")
+
+# In-flight /rag queries per event loop, keyed on the normalized query, so a
+# burst of identical questions runs the embed/search/LLM pipeline only once
+_inflight_rag_queries = weakref.WeakKeyDictionary()
+
+def _inflight_key(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+@app.post("/rag")
+@traceable
+async def rag_query(request: QueryRequest):
+    # Streamed answers can't be shared between clients
+    if request.stream:
+        return await _rag_query(request)
+    
+    loop = asyncio.get_running_loop()
+    inflight = _inflight_rag_queries.setdefault(loop, {})
+    key = _inflight_key(request.query)
+    
+    leader = inflight.get(key)
+    if leader is not None:
+        logger.info("🔗 Joining in-flight query: %s", request.query[:50])
+        join_start = time.time()
+        try:
+            result = await asyncio.shield(leader)
+            # Followers never reach the pipeline, so count them here as served
+            # from a shared result (the leader records its own outcome)
+            if not result.get("error"):
+                _record_rag_cache_hit(
+                    request.query, (time.time() - join_start) * 1000, result.get("documents_found", 0), cache_type="inflight"
+                )
+            return {**result, "query": request.query}
+        except asyncio.CancelledError:
+            if not leader.cancelled():
+                raise
+            # The leading request was cancelled; do the work ourselves
+            return await _rag_query(request)
+    
+    future = loop.create_future()
+    inflight[key] = future
+    try:
+        result = await _rag_query(request)
+        future.set_result(result)
+        return result
+    except BaseException:
+        future.cancel()
+        raise
+    finally:
+        inflight.pop(key, None)
+
+async def _rag_query(request: QueryRequest):
+    start_time = time.time()
+    cache_hit = False
+    documents_found = 0
+    error_occurred = False
+    
+    try:
+        logger.debug("🔍 Processing query: %s", request.query)
+        
+        # Check cache first for immediate response
+        cached_result = await cache_service.get_cached_result(request.query)
+        if cached_result:
+            cache_hit = True
+            documents_found = cached_result.get("documents_found", 0)
+            duration_ms = (time.time() - start_time) * 1000
+            _record_rag_cache_hit(request.query, duration_ms, documents_found)
             
-            # Execute vector search
-            search_start = time.time()
-            docs = await optimized_vector_search()
-            search_duration = (time.time() - search_start) * 1000
-            documents_found = len(docs)
+            logger.info("💾 Cache hit! Returning cached result (%.0fms)", duration_ms)
+            return _rag_response(request, cached_result)
+        
+        # Check if vectorstore is available
+        if vectorstore is None:
+            error_occurred = True
+            logger.error("Vectorstore is not initialized")
+            error_result = {
+                "query": request.query,
+                "result": "The search service is currently unavailable. Please try again later.",
+                "error": True
+            }
             
-            logger.info(f"📄 Retrieved {documents_found} documents ({search_duration:.0f}ms)")
+            duration_ms = (time.time() - start_time) * 1000
+            performance_monitor.record_request(
+                endpoint="/rag",
+                query=request.query,
+                duration_ms=duration_ms,
+                cache_hit=False,
+                documents_found=0,
+                error=True,
+                status_code=503
+            )
             
-            # Execute chain processing
-            chain_start = time.time()
-            chain_result = await run_chain(docs)
-            chain_duration = (time.time() - chain_start) * 1000
+            return _rag_response(request, error_result)
+        
+        # Embed the query once: it drives both the semantic cache and the vector search
+        query_embedding = await embed_query_vector(request.query)
+        
+        semantic_candidates = []
+        if query_embedding is not None:
+            semantic_candidates = await cache_service.semantic_lookup(query_embedding, top_k=5)
+        
+        # Run optimized vector search and LLM processing
+        async def optimized_vector_search():
+            """Async vector search over the query embedding we already have"""
+            if pinecone_index is not None and query_embedding is not None:
+                top_k = RAG_RERANK_CANDIDATES if RAG_RERANK_TOP_N > 0 else RAG_TOP_K
+                docs = await query_index_async(query_embedding, top_k=top_k)
+            else:
+                # Fallback to the sync LangChain retriever (which embeds the query itself)
+                loop = asyncio.get_running_loop()
+                retriever = get_retriever()
+                docs = await loop.run_in_executor(io_pool, retriever.get_relevant_documents, request.query)
+            return await rerank_documents(request.query, docs)
+        
+        def no_results_response() -> Dict[str, Any]:
+            """Enhanced no-results response with suggestions"""
+            return {
+                "query": request.query,
+                "result": NO_RESULTS_TEMPLATE.format(query=request.query),
+                "documents_found": 0,
+                "suggestions_provided": True
+            }
+        
+        async def run_chain(docs) -> ChainResult:
+            """Run the shared QA chain over the retrieved documents"""
+            chain = get_rag_chain()
             
-            logger.info(f"🤖 LLM processing completed ({chain_duration:.0f}ms)")
+            # Feed the documents we already retrieved instead of letting the
+            # chain hit Pinecone (and Voyage) a second time for the same query.
+            # ainvoke awaits Gemini natively instead of parking a thread per call.
+            output = await chain.ainvoke({"input_documents": docs, "question": request.query})
             
-            if isinstance(chain_result, dict) and "documents_found" in chain_result:
-                # No documents found case
-                final_result = chain_result
-            else:
-                # Normal processing
-                final_result = {
-                    "query": request.query,
-                    "result": chain_result.get("result", "No result generated"),
-                    "documents_found": documents_found,
-                    "source_documents": len(chain_result.get("source_documents", [])),
-                    "performance": {
-                        "search_duration_ms": search_duration,
-                        "llm_duration_ms": chain_duration,
-                        "total_duration_ms": (time.time() - start_time) * 1000
-                    }
+            # Enhanced post-processing
+            enhanced = _enhance_answer(output["output_text"], docs)
+            return ChainResult(result=enhanced["result"], source_documents=docs)
+        
+        # Execute vector search
+        search_start = time.time()
+        docs = await optimized_vector_search()
+        search_duration = (time.time() - search_start) * 1000
+        documents_found = len(docs)
+        
+        logger.info("📄 Retrieved %d documents (%.0fms)", documents_found, search_duration)
+        
+        # Serve a semantically similar cached answer, but only if it was
+        # grounded on the same (unchanged) evidence we just retrieved
+        for candidate in semantic_candidates:
+            if docs and cache_service.validate_evidence(candidate, docs):
+                cache_hit = True
+                duration_ms = (time.time() - start_time) * 1000
+                _record_rag_cache_hit(request.query, duration_ms, documents_found, cache_type="semantic")
+                
+                logger.info("💾 Semantic cache hit (%.3f) -> '%s' (%.0fms)", candidate["similarity"], candidate["query"][:50], duration_ms)
+                return _rag_response(request, {**candidate["result"], "query": request.query})
+        
+        def build_final_result(result_text: str, source_documents: int, chain_duration: float) -> Dict[str, Any]:
+            return {
+                "query": request.query,
+                "result": result_text,
+                "documents_found": documents_found,
+                "source_documents": source_documents,
+                "performance": {
+                    "search_duration_ms": search_duration,
+                    "llm_duration_ms": chain_duration,
+                    "total_duration_ms": (time.time() - start_time) * 1000
                 }
-            
+            }
+        
+        async def finalize(final_result: Dict[str, Any]) -> Dict[str, Any]:
+            """Cache the result and record metrics once the answer is complete"""
             # Cache successful results (but only if we found documents)
             if documents_found > 0:
-                await cache_service.set_cached_result(request.query, final_result)
+                await cache_service.set_cached_result(
+                    request.query,
+                    final_result,
+                    query_embedding=query_embedding,
+                    source_documents=docs
+                )
                 logger.info("💾 Result cached for future queries")
             
             duration_ms = (time.time() - start_time) * 1000
@@ -606,19 +1052,10 @@ RESPONSE:"""
                 }
             )
             
-            observability.record_custom_metric(
-                "rag_query_duration_ms",
-                duration_ms,
-                {"cache_hit": "false"}
-            )
+            _RAG_MISS_DURATION(duration_ms)
+            _RAG_DOCUMENTS_FOUND(documents_found)
             
-            observability.record_custom_metric(
-                "rag_documents_found",
-                documents_found,
-                {"query_type": "vector_search"}
-            )
-            
-            logger.info(f"✅ RAG query completed successfully ({duration_ms:.0f}ms total)")
+            logger.info("✅ RAG query completed successfully (%.0fms total)", duration_ms)
             
             # Monitor response quality
             if PERFORMANCE_SERVICES_AVAILABLE:
@@ -630,92 +1067,164 @@ RESPONSE:"""
                     "grade": quality_metrics["quality_grade"],
                     "improvement_suggestions": quality_metrics.get("top_improvement_areas", [])
                 }
-                logger.info(f"📊 Response quality: {quality_metrics['quality_grade']} ({quality_metrics['overall_quality_score']})")
+                logger.info("📊 Response quality: %s (%s)", quality_metrics["quality_grade"], quality_metrics["overall_quality_score"])
             
             return final_result
+        
+        if request.stream and docs:
+            # Stream tokens straight from the LLM; post-processing, caching and
+            # metrics happen once the stream completes and go out as a final event
+            async def stream_answer():
+                chain_start = time.time()
+                prompt = RAG_PROMPT.format(
+                    context="\n\n".join(doc.page_content for doc in docs),
+                    question=request.query
+                )
+                # Retrieval is done: tell the client what the answer is grounded on
+                # before the first token arrives
+                yield _sse_event({"query": request.query, "documents_found": documents_found}, event="meta")
+                answer_parts = []
+                try:
+                    async for chunk in model.astream(prompt):
+                        token = getattr(chunk, "content", chunk)
+                        answer_parts.append(token)
+                        yield _sse_event({"token": token})
+                    
+                    chain_duration = (time.time() - chain_start) * 1000
+                    logger.info("🤖 LLM streaming completed (%.0fms)", chain_duration)
+                    
+                    # Caching and metrics can still fail after tokens went out; the
+                    # client then gets a terminal error event, not a truncated stream
+                    enhanced = _enhance_answer("".join(answer_parts), docs)
+                    final_result = await finalize(build_final_result(enhanced["result"], len(docs), chain_duration))
+                except Exception as e:
+                    duration_ms = (time.time() - start_time) * 1000
+                    logger.error(f"❌ Error streaming RAG answer ({duration_ms:.0f}ms): {str(e)}", exc_info=True)
+                    performance_monitor.record_request(
+                        endpoint="/rag",
+                        query=request.query,
+                        duration_ms=duration_ms,
+                        cache_hit=False,
+                        documents_found=documents_found,
+                        error=True,
+                        status_code=500
+                    )
+                    yield _sse_event({
+                        "query": request.query,
+                        "result": "Sorry, I encountered an error while processing your request. Please try again.",
+                        "error": True,
+                        "error_details": str(e)
+                    }, event="error")
+                    return
+                
+                yield _sse_event(final_result, event="final")
             
-        except Exception as e:
-            error_occurred = True
-            duration_ms = (time.time() - start_time) * 1000
-            
-            logger.error(f"❌ Error in RAG query ({duration_ms:.0f}ms): {str(e)}", exc_info=True)
+            return StreamingResponse(stream_answer(), media_type="text/event-stream", headers=_SSE_HEADERS)
+        
+        if not docs:
+            # No documents found case
+            final_result = no_results_response()
+        else:
+            # Execute chain processing
+            chain_start = time.time()
+            chain_result = await run_chain(docs)
+            chain_duration = (time.time() - chain_start) * 1000
             
-            error_result = {
-                "query": request.query,
-                "result": f"Sorry, I encountered an error while processing your request. Please try again.",
-                "error": True,
-                "error_details": str(e)
-            }
+            logger.info("🤖 LLM processing completed (%.0fms)", chain_duration)
             
-            # Record error metrics
-            performance_monitor.record_request(
-                endpoint="/rag",
-                query=request.query,
-                duration_ms=duration_ms,
-                cache_hit=cache_hit,
-                documents_found=documents_found,
-                error=True,
-                status_code=500
+            final_result = build_final_result(
+                chain_result.result,
+                len(chain_result.source_documents),
+                chain_duration
             )
-            
-            # Record OpenTelemetry observability error metrics
-            observability.record_custom_metric(
-                "rag_query_total",
-                1,
-                {
-                    "cache_hit": str(cache_hit).lower(),
-                    "status": "error",
-                    "error_type": type(e).__name__
-                }
-            )
-            
-            observability.record_custom_metric(
-                "rag_errors_total",
-                1,
-                {
-                    "endpoint": "/rag",
-                    "error_type": type(e).__name__
-                }
-            )
-            
-            return error_result
+        
+        return _rag_response(request, await finalize(final_result))
+        
+    except Exception as e:
+        error_occurred = True
+        duration_ms = (time.time() - start_time) * 1000
+        
+        logger.error(f"❌ Error in RAG query ({duration_ms:.0f}ms): {str(e)}", exc_info=True)
+        
+        error_result = {
+            "query": request.query,
+            "result": f"Sorry, I encountered an error while processing your request. Please try again.",
+            "error": True,
+            "error_details": str(e)
+        }
+        
+        # Record error metrics
+        performance_monitor.record_request(
+            endpoint="/rag",
+            query=request.query,
+            duration_ms=duration_ms,
+            cache_hit=cache_hit,
+            documents_found=documents_found,
+            error=True,
+            status_code=500
+        )
+        
+        # Record OpenTelemetry observability error metrics
+        observability.record_custom_metric(
+            "rag_query_total",
+            1,
+            {
+                "cache_hit": str(cache_hit).lower(),
+                "status": "error",
+                "error_type": type(e).__name__
+            }
+        )
+        
+        observability.record_custom_metric(
+            "rag_errors_total",
+            1,
+            {
+                "endpoint": "/rag",
+                "error_type": type(e).__name__
+            }
+        )
+        
+        return _rag_response(request, error_result)
+
+@app.post("/rag/batch")
+async def rag_batch_query(request: BatchQueryRequest):
+    """Answer several queries in one request, results in request order"""
+    # Running them concurrently lets the embedding batcher pack every query
+    # vector into one Voyage call and overlaps the Pinecone searches and LLM
+    # calls; duplicate queries share one pipeline run via single-flight
+    results = await asyncio.gather(*[rag_query(QueryRequest(query=query)) for query in request.queries])
+    return {"results": results}
 
 @app.post("/agent")
 @traceable
 async def run_agent(request: QueryRequest):
-    with optional_span("agent-query"):
-        try:
-            # Check cache for agent queries too
-            agent_cache_key = f"agent:{request.query}"
-            cached_result = await cache_service.get_cached_result(agent_cache_key)
-            if cached_result:
-                return cached_result
-            
-            # Run agent in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            agent = create_react_agent(model, tools)
-            result = await loop.run_in_executor(
-                thread_pool, 
-                agent.invoke, 
-                {"messages": [{"role": "user", "content": request.query}]}
-            )
-            
-            # Cache agent results
-            await cache_service.set_cached_result(agent_cache_key, result)
-            
-            return result
-        except Exception as e:
-            logger.error(f"Error in agent query: {str(e)}", exc_info=True)
-            return {
-                "error": True,
-                "message": f"Agent processing failed: {str(e)}"
-            }
+    try:
+        # Check cache for agent queries too
+        agent_cache_key = f"agent:{request.query}"
+        cached_result = await cache_service.get_cached_result(agent_cache_key)
+        if cached_result:
+            return cached_result
+        
+        # Native async graph run; LangGraph moves the sync tools off the loop itself
+        agent = get_react_agent()
+        result = await agent.ainvoke({"messages": [{"role": "user", "content": request.query}]})
+        
+        # Cache agent results
+        await cache_service.set_cached_result(agent_cache_key, result)
+        
+        return result
+    except Exception as e:
+        logger.error(f"Error in agent query: {str(e)}", exc_info=True)
+        return {
+            "error": True,
+            "message": f"Agent processing failed: {str(e)}"
+        }
 
 # Cache management endpoints
 @app.get("/admin/cache/stats")
 async def get_cache_stats():
     """Get detailed cache performance statistics"""
-    return await cache_service.get_cache_stats()
+    return ORJSONResponse(await cache_service.get_cache_stats())
 
 @app.post("/admin/cache/clear")
 async def clear_cache():
@@ -742,6 +1251,10 @@ async def get_response_quality_analytics():
         logger.error(f"Error getting response quality analytics: {e}")
         return {"status": "error", "message": str(e)}
 
+# Lower bounds for each health label: >= 0.9 excellent, >= 0.8 good, ...
+_HEALTH_THRESHOLDS = (0.6, 0.7, 0.8, 0.9)
+_HEALTH_LABELS = ("poor", "needs_improvement", "satisfactory", "good", "excellent")
+
 def _assess_response_quality_health(analytics: dict) -> str:
     """Assess overall response quality health"""
     if "average_scores" not in analytics:
@@ -749,126 +1262,138 @@ def _assess_response_quality_health(analytics: dict) -> str:
     
     overall_avg = analytics["average_scores"].get("avg_overall_quality_score", 0)
     
-    if overall_avg >= 0.9:
-        return "excellent"
-    elif overall_avg >= 0.8:
-        return "good"
-    elif overall_avg >= 0.7:
-        return "satisfactory"  
-    elif overall_avg >= 0.6:
-        return "needs_improvement"
-    else:
-        return "poor"
+    return _HEALTH_LABELS[bisect.bisect_right(_HEALTH_THRESHOLDS, overall_avg)]
+
+def _recommendation(area: str, issue: str, action: str, priority: str) -> MappingProxyType:
+    return MappingProxyType({"area": area, "issue": issue, "action": action, "priority": priority})
+
+# (score key, recommendation) for each quality dimension. The recommendations are
+# constant, read-only and shared across calls rather than rebuilt every time
+_QUALITY_RULES = (
+    ("avg_bill_specificity_score", _recommendation(
+        "Bill Specificity",
+        "Responses lack specific bill references",
+        "Enhance document retrieval to prioritize bills with specific numbers and metadata",
+        "high")),
+    ("avg_structure_score", _recommendation(
+        "Response Structure",
+        "Responses are poorly formatted",
+        "Improve prompt templates to emphasize bullet points and clear organization",
+        "medium")),
+    ("avg_actionability_score", _recommendation(
+        "Actionability",
+        "Responses lack actionable information",
+        "Include bill status, committee info, and next steps in responses",
+        "high")),
+    ("avg_completeness_score", _recommendation(
+        "Completeness",
+        "Responses are incomplete or lack context",
+        "Enhance document retrieval and expand context in responses",
+        "high")),
+)
+
+_OPTIMIZATION_RECOMMENDATION = _recommendation(
+    "Optimization",
+    "Response quality is good - focus on fine-tuning",
+    "Continue monitoring and consider A/B testing different prompt variations",
+    "low"
+)
 
 def _get_quality_recommendations(analytics: dict) -> list:
     """Generate actionable recommendations for improving response quality"""
-    recommendations = []
-    
     if "average_scores" not in analytics:
         return ["Insufficient data - continue monitoring response quality"]
     
     avg_scores = analytics["average_scores"]
     
     # Check each dimension and provide specific recommendations
-    if avg_scores.get("avg_bill_specificity_score", 0) < 0.7:
-        recommendations.append({
-            "area": "Bill Specificity",
-            "issue": "Responses lack specific bill references",
-            "action": "Enhance document retrieval to prioritize bills with specific numbers and metadata",
-            "priority": "high"
-        })
-    
-    if avg_scores.get("avg_structure_score", 0) < 0.7:
-        recommendations.append({
-            "area": "Response Structure", 
-            "issue": "Responses are poorly formatted",
-            "action": "Improve prompt templates to emphasize bullet points and clear organization",
-            "priority": "medium"
-        })
-    
-    if avg_scores.get("avg_actionability_score", 0) < 0.7:
-        recommendations.append({
-            "area": "Actionability",
-            "issue": "Responses lack actionable information",
-            "action": "Include bill status, committee info, and next steps in responses",
-            "priority": "high"
-        })
-    
-    if avg_scores.get("avg_completeness_score", 0) < 0.7:
-        recommendations.append({
-            "area": "Completeness",
-            "issue": "Responses are incomplete or lack context",
-            "action": "Enhance document retrieval and expand context in responses",
-            "priority": "high"
-        })
+    recommendations = [rec for key, rec in _QUALITY_RULES if avg_scores.get(key, 0) < 0.7]
     
     # If quality is generally good, provide optimization suggestions
-    if not recommendations:
-        recommendations.append({
-            "area": "Optimization",
-            "issue": "Response quality is good - focus on fine-tuning",
-            "action": "Continue monitoring and consider A/B testing different prompt variations",
-            "priority": "low"
-        })
+    return recommendations or [_OPTIMIZATION_RECOMMENDATION]
+
+_QUALITY_RULE_KEYS = tuple(key for key, _ in _QUALITY_RULES)
+
+def _get_quality_recommendations_batch(analytics_list: List[dict]) -> List[list]:
+    """
+    Generate recommendations for many analytics records (e.g. time buckets) at once.
+    
+    Stacks every record's scores into one (records x rules) array so the
+    threshold check is a single vectorized comparison; results match calling
+    _get_quality_recommendations on each record.
+    """
+    results = [["Insufficient data - continue monitoring response quality"] for _ in analytics_list]
+    scored = [i for i, analytics in enumerate(analytics_list) if "average_scores" in analytics]
+    if not scored:
+        return results
+    
+    # float64 so values right at the 0.7 threshold compare exactly as in the scalar path
+    scores = np.array(
+        [[analytics_list[i]["average_scores"].get(key, 0) for key in _QUALITY_RULE_KEYS] for i in scored],
+        dtype=np.float64
+    )
+    below_threshold = scores < 0.7
     
-    return recommendations
+    for row, i in enumerate(scored):
+        recommendations = [
+            rec for (_, rec), flagged in zip(_QUALITY_RULES, below_threshold[row]) if flagged
+        ]
+        results[i] = recommendations or [_OPTIMIZATION_RECOMMENDATION]
+    
+    return results
 
 @app.get("/admin/performance")
 async def get_performance():
     """Get current performance metrics"""
-    return performance_monitor.get_stats()
+    # Admin payloads are plain JSON types; skip FastAPI's jsonable_encoder walk
+    return ORJSONResponse(performance_monitor.get_stats())
+
 
+# Several scrapers (Prometheus, HPA, Grafana) can poll at once; reuse the
+# rendered exposition for a short window and let only one caller rebuild it
+_METRICS_TTL_SECONDS = 0.5
+_metrics_cache: Optional[Tuple[float, bytes]] = None
+_metrics_lock = asyncio.Lock()
 
 @app.get("/metrics")
 async def get_prometheus_metrics():
     """Prometheus metrics endpoint"""
+    global _metrics_cache
+    if _metrics_cache is None or time.monotonic() - _metrics_cache[0] >= _METRICS_TTL_SECONDS:
+        async with _metrics_lock:
+            # Another scraper may have rebuilt it while we waited
+            if _metrics_cache is None or time.monotonic() - _metrics_cache[0] >= _METRICS_TTL_SECONDS:
+                # Rendering walks every collector, so keep it off the event loop
+                content = await asyncio.to_thread(observability.get_metrics_bytes)
+                _metrics_cache = (time.monotonic(), content)
+    
     return Response(
-        content=observability.get_metrics(),
+        content=_metrics_cache[1],
         media_type=observability.get_content_type()
     )
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    health_data = {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": "1.0.0",
-        "services": {
-            "cache": cache_service.get_stats(),
-            "embeddings": embeddings_service.get_stats(),
-            "database": {
-                "status": "connected",
-                "active_connections": pinecone_pool.get_stats()["active_connections"]
-            }
-        }
-    }
-    
-    # Record health check metric
-    observability.record_custom_metric(
-        "health_check_total",
-        1,
-        {"status": "success"}
-    )
-    
-    return health_data
-
 # Real-time performance dashboard endpoint
 @app.get("/admin/performance/realtime")
 async def get_realtime_performance():
     """Get real-time performance metrics for dashboard"""
-    return performance_monitor.get_real_time_stats()
+    return ORJSONResponse(performance_monitor.get_real_time_stats())
 
 # Performance alerts endpoint
 @app.get("/admin/performance/alerts")
 async def get_performance_alerts():
     """Get current performance alerts"""
     summary = performance_monitor.get_performance_summary(hours=1)
-    return {
+    # One clock read serves both the integer and the legacy float timestamp
+    timestamp_ns = time.time_ns()
+    return ORJSONResponse({
         "alerts": summary.get("performance_alerts", []),
-        "timestamp": time.time()
-    }
+        "timestamp": timestamp_ns / 1e9,
+        "timestamp_ns": timestamp_ns
+    })
+
+# One export at a time: each one serializes the full history and rewrites a file
+_export_semaphore = asyncio.Semaphore(1)
 
 # Export metrics endpoint
 @app.post("/admin/performance/export")
@@ -876,20 +1401,51 @@ async def export_performance_metrics(filename: str = "legisync_metrics.json"):
     """Export all performance metrics to file"""
     try:
         filepath = f"/tmp/{filename}"
-        performance_monitor.export_metrics(filepath)
+        async with _export_semaphore:
+            # Snapshot + encode + write all happen off the event loop
+            await asyncio.to_thread(performance_monitor.export_metrics, filepath)
         return {"message": f"Metrics exported to {filepath}", "filepath": filepath}
     except Exception as e:
         return {"error": f"Export failed: {str(e)}"}
 
+# Download variant: stream the export to the client as it is serialized.
+# The chunk iterator is synchronous, so Starlette pulls it from a worker thread.
+@app.get("/admin/performance/export.json")
+async def download_performance_metrics():
+    """Stream all performance metrics as a JSON download"""
+    if not PERFORMANCE_SERVICES_AVAILABLE:
+        return {"error": "Performance monitor not available"}
+    
+    return StreamingResponse(
+        performance_monitor.iter_export_chunks(),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="legisync_metrics.json"'}
+    )
+
 # Embeddings cache warm-up endpoint
+_WARMUP_CONCURRENT_THRESHOLD = 16
+
 @app.post("/admin/embeddings/warmup")
-async def warmup_embeddings_cache(queries: List[str]):
+async def warmup_embeddings_cache(request: Request):
     """Warm up embeddings cache with custom queries"""
     if not embeddings_service:
         return {"error": "Embeddings service not available"}
     
+    # Warm-up lists can run to thousands of strings; decode the body directly
+    # instead of having a List[str] model re-check every element
+    try:
+        queries = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        return {"error": f"Invalid JSON body: {str(e)}"}
+    if not isinstance(queries, list):
+        return {"error": "Request body must be a JSON list of queries"}
+    
     try:
-        await embeddings_service.warm_cache(queries)
+        # Large warm-ups fan out with a bounded number of embeds in flight
+        if len(queries) > _WARMUP_CONCURRENT_THRESHOLD:
+            await embeddings_service.warm_cache_concurrent(queries, concurrency=32)
+        else:
+            await embeddings_service.warm_cache(queries)
         return {
             "message": f"Cache warmed with {len(queries)} queries",
             "queries": queries
@@ -897,33 +1453,34 @@ async def warmup_embeddings_cache(queries: List[str]):
     except Exception as e:
         return {"error": f"Cache warm-up failed: {str(e)}"}
 
-# System optimization status endpoint
-@app.get("/admin/optimization/status")
-async def get_optimization_status():
-    """Get detailed status of all optimization features"""
+def _build_optimization_status() -> Dict[str, Any]:
+    """Snapshot of all optimization features and their configured settings"""
+    pool, cache, embeddings = pinecone_pool, cache_service, embeddings_service
     return {
         "optimization_features": {
             "multi_tier_caching": {
-                "enabled": cache_service is not None,
+                "enabled": cache is not None,
                 "memory_cache": True,
-                "redis_cache": cache_service.async_redis_client is not None if cache_service else False,
+                "redis_cache": cache is not None and cache.async_redis_client is not None,
                 "similarity_matching": True
             },
             "connection_pooling": {
-                "enabled": pinecone_pool is not None,
-                "max_connections": pinecone_pool.max_connections if pinecone_pool else 0,
-                "active_connections": len(pinecone_pool._in_use) if pinecone_pool else 0
+                "enabled": pool is not None,
+                "max_connections": pool.max_connections if pool else 0,
+                "active_connections": pool.active_connections if pool else 0
             },
             "async_processing": {
                 "enabled": True,
-                "thread_pool_size": thread_pool._max_workers,
+                "thread_pools": {
+                    "io": io_pool._max_workers
+                },
                 "http_client_pooling": http_client is not None
             },
             "embeddings_optimization": {
-                "enabled": embeddings_service is not None,
+                "enabled": embeddings is not None,
                 "batch_processing": True,
                 "caching": True,
-                "model": embeddings_service.model if embeddings_service else None
+                "model": embeddings.model if embeddings else None
             },
             "performance_monitoring": {
                 "enabled": performance_monitor is not None,
@@ -939,4 +1496,45 @@ async def get_optimization_status():
             "concurrent_users": "1000+",
             "scalability": "millions of requests"
         }
-    }
\ No newline at end of file
+    }
+
+# Dashboards poll this endpoint; memoize the encoded payload briefly and let
+# repeat pollers revalidate with If-None-Match
+_OPT_STATUS_TTL_SECONDS = 1.0
+_opt_status_cache: Optional[Tuple[float, bytes, str]] = None
+
+# Everything but the pool's active connection count only changes when services
+# are (re)configured, so the status dict is built once and patched per rebuild
+_opt_status_snapshot: Optional[Dict[str, Any]] = None
+
+def invalidate_optimization_status():
+    """Drop the status snapshot and encoded payload after services are (re)configured"""
+    global _opt_status_snapshot, _opt_status_cache
+    _opt_status_snapshot = None
+    _opt_status_cache = None
+
+def _current_optimization_status() -> Dict[str, Any]:
+    global _opt_status_snapshot
+    if _opt_status_snapshot is None:
+        _opt_status_snapshot = _build_optimization_status()
+    
+    _opt_status_snapshot["optimization_features"]["connection_pooling"]["active_connections"] = (
+        pinecone_pool.active_connections if pinecone_pool else 0
+    )
+    return _opt_status_snapshot
+
+# System optimization status endpoint
+@app.get("/admin/optimization/status")
+async def get_optimization_status(request: Request):
+    """Get detailed status of all optimization features"""
+    global _opt_status_cache
+    now = time.monotonic()
+    if _opt_status_cache is None or now - _opt_status_cache[0] >= _OPT_STATUS_TTL_SECONDS:
+        payload = _dumps(_current_optimization_status())
+        etag = f'"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"'
+        _opt_status_cache = (now, payload, etag)
+    
+    _, payload, etag = _opt_status_cache
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
@@ -1,14 +1,79 @@
 # backend/cache_service.py
 import json
+import os
 import hashlib
 import logging
-from typing import Optional, Dict, Any, List
+import re
+import unicodedata
+from typing import Optional, Dict, Any, List, Tuple
 from cachetools import TTLCache
 import asyncio
+import heapq
 from datetime import timedelta
+import numpy as np
+
+# Non-cryptographic content hash for cache keys (also used by embeddings_service)
+try:
+    import xxhash
+    def fast_hash(data: bytes) -> str:
+        return xxhash.xxh3_64_hexdigest(data)
+except ImportError:  # pragma: no cover - xxhash is in requirements.txt
+    def fast_hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+_WHITESPACE_RE = re.compile(r'\s+')
 
 logger = logging.getLogger(__name__)
 
+class SemanticCacheMatrix:
+    """
+    Preallocated matrix of L2-normalized query embeddings, one row per cache key.
+    Inserts and removals touch a single row, so a lookup is always one matrix-vector
+    product over the rows in use instead of re-stacking every entry after a change.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.clear()
+    
+    def clear(self):
+        self.matrix: Optional[np.ndarray] = None
+        self.rows: Dict[str, int] = {}
+        self.keys: List[Optional[str]] = [None] * self.capacity
+        # Lowest free row first keeps the used rows packed at the top
+        self._free_rows = list(range(self.capacity))
+        self._rows_in_use = 0
+    
+    def add(self, key: str, vector: np.ndarray):
+        # Rows are sized by the first embedding (the model dimension)
+        if self.matrix is None or self.matrix.shape[1] != vector.shape[0]:
+            self.clear()
+            self.matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        row = self.rows.get(key)
+        if row is None:
+            row = heapq.heappop(self._free_rows)
+            self.rows[key] = row
+            self.keys[row] = key
+            self._rows_in_use = max(self._rows_in_use, row + 1)
+        self.matrix[row] = vector
+    
+    def discard(self, key: str):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # A zero row scores 0 and can never clear the similarity threshold
+        self.matrix[row] = 0.0
+        self.keys[row] = None
+        heapq.heappush(self._free_rows, row)
+        while self._rows_in_use and self.keys[self._rows_in_use - 1] is None:
+            self._rows_in_use -= 1
+    
+    def scores(self, vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every used row against an L2-normalized vector"""
+        if self.matrix is None:
+            return np.empty(0, dtype=np.float32)
+        return self.matrix[:self._rows_in_use] @ vector
+
 class CacheService:
     """
     Advanced caching service for RAG optimizations with memory-based caching
@@ -18,9 +83,14 @@ class CacheService:
     def __init__(
         self, 
         redis_url: str = "redis://localhost:6379/0",
-        memory_cache_size: int = 1000,
+        memory_cache_size: int = 10_000,
         memory_ttl: int = 300,  # 5 minutes
-        redis_ttl: int = 3600   # 1 hour
+        redis_ttl: int = 3600,  # 1 hour
+        semantic_threshold: float = 0.95,
+        evidence_threshold: float = 0.7,
+        semantic_ttl: Optional[int] = None,
+        semantic_cache_size: int = 500,
+        doc_set_threshold: Optional[float] = None
     ):
         self.redis_url = redis_url
         self.redis_ttl = redis_ttl
@@ -33,6 +103,18 @@ class CacheService:
         # Query similarity cache - stores normalized queries
         self.similarity_cache = TTLCache(maxsize=500, ttl=1800)  # 30 minutes
         
+        # Semantic cache - query embeddings plus the evidence each answer was grounded on.
+        # Entries are re-validated against fresh evidence before use, so they can
+        # safely outlive the exact-match cache
+        self.semantic_cache = TTLCache(maxsize=semantic_cache_size, ttl=semantic_ttl or memory_ttl)
+        self.semantic_threshold = semantic_threshold
+        # Embeddings live in one matrix, kept row-for-row in step with semantic_cache
+        self.semantic_matrix = SemanticCacheMatrix(self.semantic_cache.maxsize)
+        self.evidence_threshold = evidence_threshold
+        # Looser query similarity accepted when the retrieved documents are
+        # exactly the set a cached answer was grounded on (None disables)
+        self.doc_set_threshold = doc_set_threshold
+        
         # Connection pool for Redis (disabled for compatibility)
         self.connection_pool = None
         
@@ -43,15 +125,14 @@ class CacheService:
         return True
     
     def _get_cache_key(self, query: str, prefix: str = "rag") -> str:
-        """Generate cache key from query"""
-        query_hash = hashlib.md5(query.lower().strip().encode()).hexdigest()
+        """Generate cache key from the normalized query, so case/whitespace variants share an entry"""
+        query_hash = fast_hash(self._normalize_query(query).encode())
         return f"{prefix}:{query_hash}"
     
     def _normalize_query(self, query: str) -> str:
-        """Normalize query for similarity detection"""
-        # Remove extra whitespace, convert to lowercase, remove common words
-        import re
-        normalized = re.sub(r'\s+', ' ', query.lower().strip())
+        """Normalize query for cache keys and similarity detection"""
+        # Unicode-normalize (e.g. full-width digits, ligatures), lowercase, collapse whitespace
+        normalized = _WHITESPACE_RE.sub(' ', unicodedata.normalize("NFKC", query).lower().strip())
         # Could add more sophisticated normalization like stemming
         return normalized
     
@@ -65,22 +146,32 @@ class CacheService:
         
         # Level 1: Memory cache (fastest)
         if cache_key in self.memory_cache:
-            logger.info(f"Cache HIT (memory): {query[:50]}...")
+            logger.debug("Cache HIT (memory): %s...", query[:50])
             return self.memory_cache[cache_key]
         
         # Level 2: Query similarity detection
         normalized_query = self._normalize_query(query)
-        for cached_query, cached_key in self.similarity_cache.items():
+        for cached_query, original_query in self.similarity_cache.items():
             # Simple similarity check - could be enhanced with semantic similarity
             if self._query_similarity(normalized_query, cached_query) > 0.8:
-                logger.info(f"Cache HIT (similarity): {query[:50]} -> {cached_query[:50]}")
-                return await self.get_cached_result(cached_key)
+                # Read the memory cache directly: similarity entries outlive the
+                # results they point to, and an expired one must count as a miss
+                result = self.memory_cache.get(self._get_cache_key(original_query))
+                if result is not None:
+                    logger.debug("Cache HIT (similarity): %s -> %s", query[:50], cached_query[:50])
+                    return result
         
-        logger.info(f"Cache MISS: {query[:50]}...")
+        logger.debug("Cache MISS: %s...", query[:50])
         return None
     
-    async def set_cached_result(self, query: str, result: Dict[Any, Any]):
-        """Store result in memory cache"""
+    async def set_cached_result(
+        self,
+        query: str,
+        result: Dict[Any, Any],
+        query_embedding: Optional[List[float]] = None,
+        source_documents: Optional[List[Any]] = None
+    ):
+        """Store result in memory cache (and the semantic cache when an embedding is given)"""
         cache_key = self._get_cache_key(query)
         
         # Store in memory cache
@@ -90,7 +181,105 @@ class CacheService:
         normalized_query = self._normalize_query(query)
         self.similarity_cache[normalized_query] = query
         
-        logger.info(f"Cached result for: {query[:50]}...")
+        # Store embedding + evidence signature for semantic lookups
+        if query_embedding is not None and source_documents:
+            doc_ids, doc_versions = self.build_evidence_signature(source_documents)
+            self._expire_semantic()
+            # Evict here rather than inside TTLCache so the entry's row is freed too
+            if cache_key not in self.semantic_cache and len(self.semantic_cache) >= self.semantic_cache.maxsize:
+                evicted_key, _ = self.semantic_cache.popitem()
+                self.semantic_matrix.discard(evicted_key)
+            self.semantic_cache[cache_key] = {
+                "query": query,
+                "result": result,
+                "doc_ids": doc_ids,
+                "doc_versions": doc_versions
+            }
+            self.semantic_matrix.add(cache_key, self._normalize_embedding(query_embedding))
+        
+        logger.debug("Cached result for: %s...", query[:50])
+    
+    @staticmethod
+    def _normalize_embedding(embedding: List[float]) -> np.ndarray:
+        """L2-normalize an embedding so cosine similarity becomes a dot product"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    @staticmethod
+    def _document_id(doc: Any) -> str:
+        """Stable identifier for a retrieved document"""
+        metadata = getattr(doc, "metadata", None) or {}
+        doc_id = metadata.get("bill_id") or metadata.get("id")
+        if doc_id:
+            return str(doc_id)
+        content = str(getattr(doc, "page_content", ""))
+        return fast_hash(content.encode())
+    
+    @classmethod
+    def build_evidence_signature(cls, documents: List[Any]) -> Tuple[frozenset, Dict[str, str]]:
+        """Build the (doc id set, doc versions) signature an answer was grounded on"""
+        doc_versions = {}
+        for doc in documents:
+            metadata = getattr(doc, "metadata", None) or {}
+            version = metadata.get("last_updated") or metadata.get("last_action") or ""
+            doc_versions[cls._document_id(doc)] = str(version)
+        return frozenset(doc_versions), doc_versions
+    
+    async def semantic_lookup(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find cached answers whose query embedding is close to this one.
+        Candidates still have to pass validate_evidence before being served.
+        """
+        # Drop expired entries first so they can't be served from stale rows
+        self._expire_semantic()
+        if not self.semantic_cache:
+            return []
+        
+        scores = self.semantic_matrix.scores(self._normalize_embedding(query_embedding))
+        
+        threshold = self.semantic_threshold
+        if self.doc_set_threshold is not None:
+            threshold = min(threshold, self.doc_set_threshold)
+        
+        # Only the (usually few) entries above the threshold need sorting
+        above = np.flatnonzero(scores >= threshold)
+        ranked = above[np.argsort(scores[above])[::-1][:top_k]]
+        candidates = []
+        for row in ranked:
+            entry = self.semantic_cache.get(self.semantic_matrix.keys[row])
+            if entry is not None:
+                candidates.append({**entry, "similarity": float(scores[row])})
+        return candidates
+    
+    def _expire_semantic(self):
+        """Expire semantic entries and free the matrix rows of any that went away"""
+        self.semantic_cache.expire()
+        if len(self.semantic_matrix.rows) != len(self.semantic_cache):
+            for key in [key for key in self.semantic_matrix.rows if key not in self.semantic_cache]:
+                self.semantic_matrix.discard(key)
+    
+    def validate_evidence(self, candidate: Dict[str, Any], documents: List[Any]) -> bool:
+        """
+        Check a semantic candidate against freshly retrieved documents:
+        the doc id sets must overlap (Jaccard) and shared docs must be unchanged.
+        Candidates below semantic_threshold (admitted by doc_set_threshold) need
+        the exact same document set instead of a mere overlap.
+        """
+        doc_ids, doc_versions = self.build_evidence_signature(documents)
+        cached_ids = candidate["doc_ids"]
+        union = len(doc_ids | cached_ids)
+        if union == 0:
+            return False
+        
+        if candidate.get("similarity", 1.0) < self.semantic_threshold:
+            if doc_ids != cached_ids:
+                return False
+        elif len(doc_ids & cached_ids) / union < self.evidence_threshold:
+            return False
+        
+        cached_versions = candidate["doc_versions"]
+        return all(doc_versions[doc_id] == cached_versions[doc_id] for doc_id in doc_ids & cached_ids)
     
     def _query_similarity(self, query1: str, query2: str) -> float:
         """Simple Jaccard similarity for query matching"""
@@ -106,6 +295,7 @@ class CacheService:
             "memory_cache_size": len(self.memory_cache),
             "memory_cache_maxsize": self.memory_cache.maxsize,
             "similarity_cache_size": len(self.similarity_cache),
+            "semantic_cache_size": len(self.semantic_cache),
             "redis_connected": False,
             "cache_mode": "memory_only"
         }
@@ -118,6 +308,7 @@ class CacheService:
             "memory_cache_size": len(self.memory_cache),
             "memory_cache_maxsize": self.memory_cache.maxsize,
             "similarity_cache_size": len(self.similarity_cache),
+            "semantic_cache_size": len(self.semantic_cache),
             "redis_connected": False,
             "cache_mode": "memory_only"
         }
@@ -126,6 +317,8 @@ class CacheService:
         """Clear memory cache"""
         self.memory_cache.clear()
         self.similarity_cache.clear()
+        self.semantic_cache.clear()
+        self.semantic_matrix.clear()
         logger.info("Memory cache cleared")
     
     async def close(self):
@@ -133,4 +326,11 @@ class CacheService:
         logger.info("Cache service closed")
 
 # Global cache instance
-cache_service = CacheService()
+cache_service = CacheService(
+    semantic_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    semantic_ttl=int(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600))),
+    semantic_cache_size=int(os.getenv("SEMANTIC_CACHE_SIZE", "500")),
+    # Opt-in: different questions about one bill retrieve the same documents,
+    # so a looser match on the document set alone can serve the wrong answer
+    doc_set_threshold=float(os.getenv("SEMANTIC_DOC_SET_THRESHOLD") or 0) or None
+)
@@ -45,6 +45,11 @@ class PineconeConnectionPool:
         
         logger.info(f"Pinecone connection pool initialized (max_connections: {max_connections})")
         
+    @property
+    def active_connections(self) -> int:
+        """Connections currently checked out (a lock-free O(1) read for hot paths)"""
+        return len(self._in_use)
+    
     @property 
     def _available(self):
         """Get available connections (for backward compatibility)"""
@@ -128,10 +133,10 @@ class PineconeConnectionPool:
         return {
             **self._stats.copy(),
             "pool_size": len(self._pool),
-            "active_connections": len(self._in_use),
+            "active_connections": self.active_connections,
             "available_connections": len(self._pool),
             "max_connections": self.max_connections,
-            "pool_utilization": len(self._in_use) / self.max_connections if self.max_connections > 0 else 0
+            "pool_utilization": self.active_connections / self.max_connections if self.max_connections > 0 else 0
         }
     
     async def acquire_connection(self):
@@ -1,16 +1,151 @@
 # backend/embeddings_service.py
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import os
+from typing import List, Dict, Any, Optional, Callable
 from voyageai import Client as VoyageClient
 import httpx
 from concurrent.futures import ThreadPoolExecutor
 import time
-from cache_service import cache_service
-import hashlib
+from cachetools import LRUCache
+from cache_service import cache_service, fast_hash
+import weakref
 
 logger = logging.getLogger(__name__)
 
+# Voyage output precision. "int8" is ~4x smaller on the wire, but queries must
+# match how the Pinecone index was ingested, so it is opt-in via env
+VOYAGE_OUTPUT_DTYPE = os.getenv("VOYAGE_OUTPUT_DTYPE", "float")
+# Matryoshka output size (256/512/1024/2048); unset keeps the model default.
+# Like the dtype, changing it means re-embedding the whole index
+VOYAGE_OUTPUT_DIMENSION = int(os.getenv("VOYAGE_OUTPUT_DIMENSION") or 0) or None
+
+class EmbeddingBatcher:
+    """
+    Micro-batching coalescer for query embeddings.
+    
+    Concurrent submit() calls are queued and dispatched as a single
+    embed(texts) call: a lone request is sent immediately, while requests that
+    pile up behind an in-flight call are drained together (waiting at most
+    max_wait_ms for stragglers) up to max_batch_size texts per call.
+    Up to max_in_flight batches run at once; while they are all busy, new
+    requests keep accumulating into the next batch.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        executor: Optional[ThreadPoolExecutor] = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 4
+    ):
+        self.embed_fn = embed_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        
+        # One queue and dispatch task per event loop: asyncio primitives are
+        # loop-bound, and a process can run several loops (e.g. test clients)
+        self._queues = weakref.WeakKeyDictionary()
+        self._workers = weakref.WeakKeyDictionary()
+        self._slots = weakref.WeakKeyDictionary()
+        # Strong references so running dispatch tasks aren't garbage collected
+        self._dispatches = set()
+        
+        self.stats = {
+            "batches_dispatched": 0,
+            "texts_embedded": 0,
+            "direct_calls": 0,
+            "max_batch_seen": 0
+        }
+    
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """Return this loop's queue, starting its dispatch task if none is running"""
+        queue = self._queues.get(loop)
+        if queue is None:
+            queue = self._queues[loop] = asyncio.Queue()
+            self._slots[loop] = asyncio.Semaphore(self.max_in_flight)
+        worker = self._workers.get(loop)
+        if worker is None or worker.done():
+            self._workers[loop] = loop.create_task(self._run(queue, loop))
+        return queue
+    
+    async def submit(self, text: str) -> List[float]:
+        """Queue a text for embedding and wait for its vector"""
+        loop = asyncio.get_running_loop()
+        queue = self._ensure_worker(loop)
+        future = loop.create_future()
+        queue.put_nowait((text, future))
+        return await future
+    
+    async def _collect_batch(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> List[tuple]:
+        """Wait for one request, then coalesce whatever else is pending"""
+        batch = [await queue.get()]
+        
+        # Lone request: dispatch straight away instead of paying the wait window
+        if queue.empty():
+            return batch
+        
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        """Dispatch loop: runs only while requests are queued, then exits"""
+        slots = self._slots[loop]
+        while not queue.empty():
+            # Wait for a free slot before draining, so a busy Voyage API
+            # yields fewer, larger batches rather than more concurrent calls
+            await slots.acquire()
+            batch = await self._collect_batch(queue, loop)
+            task = loop.create_task(self._dispatch(batch, loop))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+            task.add_done_callback(lambda _: slots.release())
+    
+    async def _dispatch(self, batch: List[tuple], loop: asyncio.AbstractEventLoop):
+        """Embed a batch of (text, future) pairs with a single call"""
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await loop.run_in_executor(self.executor, self.embed_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+        
+        self.stats["batches_dispatched"] += 1
+        self.stats["texts_embedded"] += len(batch)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+        if len(batch) == 1:
+            self.stats["direct_calls"] += 1
+    
+    async def close(self):
+        """Stop the dispatch task on the current event loop"""
+        worker = self._workers.pop(asyncio.get_running_loop(), None)
+        if worker and not worker.done():
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
 class OptimizedEmbeddingsService:
     """
     Optimized embeddings service with caching, batching, and async processing
@@ -22,16 +157,31 @@ class OptimizedEmbeddingsService:
         api_key: str, 
         model: str = "voyage-3.5",
         batch_size: int = 100,
-        max_workers: int = 5
+        max_workers: int = 5,
+        max_batch_chars: int = 100_000
     ):
         self.client = VoyageClient(api_key=api_key)
         self.model = model
         self.batch_size = batch_size
+        # Character budget per embed call, a cheap proxy for Voyage's per-request token limit
+        self.max_batch_chars = max_batch_chars
         self.max_workers = max_workers
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
         
-        # Simple in-memory cache for backward compatibility with tests
-        self.cache = {}
+        # Coalesces concurrent query embeddings into batched Voyage calls
+        self.query_batcher = EmbeddingBatcher(
+            lambda texts: self.client.embed(
+                texts, model=self.model, input_type="query",
+                output_dtype=VOYAGE_OUTPUT_DTYPE, output_dimension=VOYAGE_OUTPUT_DIMENSION
+            ).embeddings,
+            executor=self.executor,
+            max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "64")),
+            max_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "10"))
+        )
+        
+        # Process-local LRU of query vectors in front of the shared TTL cache;
+        # bounded so a stream of unique queries can't grow it without limit
+        self.cache = LRUCache(maxsize=int(os.getenv("EMBEDDING_LRU_SIZE", "4096")))
         
         # Statistics tracking
         self.stats = {
@@ -49,25 +199,30 @@ class OptimizedEmbeddingsService:
         return self._get_embedding_cache_key(text, input_type)
     
     def _get_embedding_cache_key(self, text: str, input_type: str = "query") -> str:
-        """Generate cache key for embedding"""
-        content = f"{text}:{input_type}:{self.model}"
-        return f"embedding:{hashlib.md5(content.encode()).hexdigest()}"
+        """Generate a fixed-length, content-addressed cache key for embedding"""
+        # Queries are normalized like /rag cache keys, so case/whitespace/Unicode
+        # width variants share one vector; document text is keyed verbatim
+        if input_type == "query":
+            text = cache_service._normalize_query(text)
+        content = f"{text}:{input_type}:{self.model}:{VOYAGE_OUTPUT_DTYPE}:{VOYAGE_OUTPUT_DIMENSION}"
+        return f"embedding:{fast_hash(content.encode())}"
     
     async def embed_query(self, text: str) -> List[float]:
         """Embed a single query with caching"""
         cache_key = self._get_embedding_cache_key(text, "query")
         
-        # Check simple cache first (for tests)
-        if cache_key in self.cache:
+        # Check the process-local LRU first
+        embedding = self.cache.get(cache_key)
+        if embedding is not None:
             self.stats["cache_hits"] += 1
             logger.debug(f"Embedding cache hit for query: {text[:50]}...")
-            return self.cache[cache_key]
+            return embedding
         
         # Check advanced cache
         cached_embedding = await cache_service.get_cached_result(cache_key)
         if cached_embedding and "embedding" in cached_embedding:
             self.stats["cache_hits"] += 1
-            # Store in simple cache too
+            # Promote into the local LRU
             self.cache[cache_key] = cached_embedding["embedding"]
             logger.debug(f"Embedding cache hit for query: {text[:50]}...")
             return cached_embedding["embedding"]
@@ -75,11 +230,7 @@ class OptimizedEmbeddingsService:
         # Generate embedding
         self.stats["cache_misses"] += 1
         try:
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                self.executor,
-                lambda: self.client.embed([text], model=self.model, input_type="query").embeddings[0]
-            )
+            embedding = await self.query_batcher.submit(text)
             
             # Cache the result in both caches
             self.cache[cache_key] = embedding
@@ -130,10 +281,19 @@ class OptimizedEmbeddingsService:
         embeddings: List[Optional[List[float]]]
     ):
         """Process uncached embeddings in optimal batches"""
-        # Split into batches
+        # Pack shortest-first, closing a batch at batch_size texts or
+        # max_batch_chars characters, so a few long documents can't push a
+        # count-sized batch over the request limit (results are placed by index)
         batches = []
-        for i in range(0, len(uncached_texts), self.batch_size):
-            batch = uncached_texts[i:i + self.batch_size]
+        batch, batch_chars = [], 0
+        for item in sorted(uncached_texts, key=lambda item: len(item[1])):
+            text_chars = len(item[1])
+            if batch and (len(batch) >= self.batch_size or batch_chars + text_chars > self.max_batch_chars):
+                batches.append(batch)
+                batch, batch_chars = [], 0
+            batch.append(item)
+            batch_chars += text_chars
+        if batch:
             batches.append(batch)
         
         # Process batches concurrently
@@ -154,13 +314,15 @@ class OptimizedEmbeddingsService:
             texts_to_embed = [item[1] for item in batch]
             
             # Generate embeddings for batch
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             batch_embeddings = await loop.run_in_executor(
                 self.executor,
                 lambda: self.client.embed(
                     texts_to_embed, 
                     model=self.model, 
-                    input_type="document"
+                    input_type="document",
+                    output_dtype=VOYAGE_OUTPUT_DTYPE,
+                    output_dimension=VOYAGE_OUTPUT_DIMENSION
                 ).embeddings
             )
             
@@ -201,6 +363,19 @@ class OptimizedEmbeddingsService:
         successful = sum(1 for r in results if not isinstance(r, Exception))
         logger.info(f"Embedding cache warmed successfully ({successful}/{len(common_queries)})")
     
+    async def warm_cache_concurrent(self, common_queries: List[str], concurrency: int = 32):
+        """Pre-warm cache with many queries, keeping at most `concurrency` embeds in flight"""
+        logger.info(f"Warming embedding cache with {len(common_queries)} queries (concurrency {concurrency})")
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def warm(query: str):
+            async with semaphore:
+                return await self.embed_query(query)
+        
+        results = await asyncio.gather(*[warm(query) for query in common_queries], return_exceptions=True)
+        successful = sum(1 for r in results if not isinstance(r, Exception))
+        logger.info(f"Embedding cache warmed successfully ({successful}/{len(common_queries)})")
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get service statistics"""
         total_requests = self.stats["cache_hits"] + self.stats["cache_misses"]
@@ -209,11 +384,13 @@ class OptimizedEmbeddingsService:
             "model": self.model,
             "batch_size": self.batch_size,
             "max_workers": self.executor._max_workers,
+            "query_batching": self.query_batcher.stats.copy(),
             "cache_hit_rate": self.stats["cache_hits"] / total_requests if total_requests > 0 else 0
         }
     
     async def close(self):
         """Cleanup resources"""
+        await self.query_batcher.close()
         self.executor.shutdown(wait=True)
         logger.info("Embeddings service closed")
 
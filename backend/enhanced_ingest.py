@@ -3,6 +3,7 @@ Enhanced Bill Ingestion Script
 Processes bills from multiple sources and ingests into Pinecone
 """
 import os
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 import logging
@@ -68,52 +69,71 @@ class EnhancedBillProcessor:
         
         return processed_bills
     
-    def create_enhanced_embeddings(self, bills: List[Dict]) -> List[Dict]:
+    def create_enhanced_embeddings(self, bills: List[Dict], batch_size: int = 128) -> List[Dict]:
         """
         Create embeddings with enhanced metadata
+        
+        Bills are embedded batch_size texts per Voyage call instead of one call
+        per bill; each batch is held as a float32 matrix and only converted to
+        lists when the Pinecone vectors are built.
         """
         vectors = []
         
-        for i, bill in enumerate(bills):
+        for start in range(0, len(bills), batch_size):
+            batch = []
+            for bill in bills[start:start + batch_size]:
+                try:
+                    # Create rich text for embedding
+                    batch.append((bill, self.create_embedding_text(bill)))
+                except Exception as e:
+                    logger.error(f"Error creating embedding for {bill.get('id', 'unknown')}: {e}")
+            
+            if not batch:
+                continue
+            
             try:
-                # Create rich text for embedding
-                embedding_text = self.create_embedding_text(bill)
-                
-                # Generate embedding
-                embedding = self.voyage_client.embed(
-                    [embedding_text], 
-                    model="voyage-3.5", 
-                    input_type="document"
-                ).embeddings[0]
-                
-                # Enhanced metadata
-                metadata = {
-                    "text": embedding_text,
-                    "bill_number": bill["bill_number"],
-                    "title": bill["title"],
-                    "summary": bill["summary"][:500] + "..." if len(bill["summary"]) > 500 else bill["summary"],
-                    "status": bill["status"],
-                    "authors": ", ".join(bill["authors"][:3]),  # Limit for metadata size
-                    "subjects": ", ".join(bill["subjects"][:5]),
-                    "session": bill["session"],
-                    "bill_type": bill["bill_type"],
-                    "source": bill["source"],
-                    "introduced_date": bill["introduced_date"],
-                    "last_updated": bill["last_updated"]
-                }
-                
-                vectors.append({
-                    "id": bill["id"],
-                    "values": embedding,
-                    "metadata": metadata
-                })
-                
-                if (i + 1) % 50 == 0:
-                    logger.info(f"Processed {i + 1}/{len(bills)} bills")
-                    
+                # Generate embeddings for the whole batch in one request
+                embeddings = np.asarray(
+                    self.voyage_client.embed(
+                        [text for _, text in batch],
+                        model="voyage-3.5",
+                        input_type="document",
+                        output_dtype=os.getenv("VOYAGE_OUTPUT_DTYPE", "float"),
+                        output_dimension=int(os.getenv("VOYAGE_OUTPUT_DIMENSION") or 0) or None
+                    ).embeddings,
+                    dtype=np.float32
+                )
             except Exception as e:
-                logger.error(f"Error creating embedding for {bill['id']}: {e}")
+                logger.error(f"Error creating embeddings for bills {start + 1}-{start + len(batch)}: {e}")
                 continue
+            
+            for (bill, embedding_text), embedding in zip(batch, embeddings):
+                try:
+                    # Enhanced metadata
+                    metadata = {
+                        "text": embedding_text,
+                        "bill_number": bill["bill_number"],
+                        "title": bill["title"],
+                        "summary": bill["summary"][:500] + "..." if len(bill["summary"]) > 500 else bill["summary"],
+                        "status": bill["status"],
+                        "authors": ", ".join(bill["authors"][:3]),  # Limit for metadata size
+                        "subjects": ", ".join(bill["subjects"][:5]),
+                        "session": bill["session"],
+                        "bill_type": bill["bill_type"],
+                        "source": bill["source"],
+                        "introduced_date": bill["introduced_date"],
+                        "last_updated": bill["last_updated"]
+                    }
+                    
+                    vectors.append({
+                        "id": bill["id"],
+                        "values": embedding.tolist(),
+                        "metadata": metadata
+                    })
+                except Exception as e:
+                    logger.error(f"Error creating embedding for {bill['id']}: {e}")
+            
+            logger.info(f"Processed {min(start + batch_size, len(bills))}/{len(bills)} bills")
         
         return vectors
     
@@ -55,7 +55,13 @@ for i in range(0, len(texts), batch_size):
     print(f"Processing batch {batch_num}/{total_batches} ({len(batch_texts)} items)...")
     
     try:
-        batch_embeddings = vo.embed(batch_texts, model="voyage-3.5", input_type="document").embeddings
+        batch_embeddings = vo.embed(
+            batch_texts,
+            model="voyage-3.5",
+            input_type="document",
+            output_dtype=os.getenv("VOYAGE_OUTPUT_DTYPE", "float"),  # "int8" for ~4x smaller vectors
+            output_dimension=int(os.getenv("VOYAGE_OUTPUT_DIMENSION") or 0) or None  # e.g. 512; index dimension must match
+        ).embeddings
         all_embeddings.extend(batch_embeddings)
         
         # Small delay to be API-friendly
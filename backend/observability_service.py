@@ -66,7 +66,14 @@ class LegisyncObservability:
                     endpoint=self.jaeger_endpoint,
                     collector_endpoint=self.jaeger_endpoint,
                 )
-                span_processor = BatchSpanProcessor(jaeger_exporter)
+                # Larger queue and batches than the SDK defaults (2048/512, 5s) so
+                # bursts don't drop spans and the exporter thread wakes less often
+                span_processor = BatchSpanProcessor(
+                    jaeger_exporter,
+                    max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "4096")),
+                    max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")),
+                    schedule_delay_millis=int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "2000"))
+                )
                 trace.get_tracer_provider().add_span_processor(span_processor)
                 logger.info("✅ Jaeger tracing enabled")
             except Exception as e:
@@ -4,18 +4,52 @@ Provides metrics collection using prometheus_client directly to avoid compatibil
 """
 
 import time
+import asyncio
+import functools
 import logging
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Callable, Dict, Any, Optional
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
 logger = logging.getLogger(__name__)
 
+class ActiveRequestsMiddleware:
+    """
+    Pure ASGI middleware tracking in-flight HTTP requests.
+    
+    Unlike an @app.middleware("http") function it doesn't wrap the request and
+    response bodies in extra streams and tasks, so it adds a single frame per request.
+    """
+    
+    def __init__(self, app, gauge: Gauge):
+        self.app = app
+        self.gauge = gauge
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        self.gauge.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gauge.dec()
+
 class SimplifiedObservabilityService:
     """Simplified observability service using prometheus_client directly"""
     
     def __init__(self):
         """Initialize the observability service with basic metrics"""
         self.initialized = False
+        # Request handlers only append here; a background task applies the
+        # updates to Prometheus off the hot path (deque appends are thread-safe)
+        self.metrics_queue = deque(maxlen=100_000)
+        # A full queue evicts its oldest update; evictions are counted here and
+        # reported as metrics_dropped_total when the queue is drained
+        self.metrics_dropped = 0
+        self._metrics_dropped_reported = 0
+        self._drain_task: Optional[asyncio.Task] = None
         self._setup_metrics()
         
     def _setup_metrics(self):
@@ -64,6 +98,11 @@ class SimplifiedObservabilityService:
                 'Number of active requests'
             )
             
+            self.metrics_dropped_counter = Counter(
+                'metrics_dropped_total',
+                'Metric updates dropped because the metrics queue was full'
+            )
+            
             self.initialized = True
             logger.info("✅ Simplified observability service initialized")
             
@@ -81,56 +120,144 @@ class SimplifiedObservabilityService:
         logger.info("✅ FastAPI observability service registered")
     
     def get_middleware(self):
-        """Get the middleware function for manual addition to FastAPI app"""
+        """Get the ASGI middleware for manual addition to FastAPI app"""
         if not self.initialized:
             return None
-            
-        async def add_prometheus_middleware(request, call_next):
-            start_time = time.time()
-            self.active_requests.inc()
-            
-            try:
-                response = await call_next(request)
-                return response
-            finally:
-                self.active_requests.dec()
         
-        return add_prometheus_middleware
+        return functools.partial(ActiveRequestsMiddleware, gauge=self.active_requests)
     
     def record_custom_metric(self, metric_name: str, value: float, labels: Optional[Dict[str, str]] = None):
-        """Record a custom metric"""
+        """Queue a custom metric update for the background drain"""
         if not self.initialized:
             return
-            
-        labels = labels or {}
         
+        self._enqueue((metric_name, value, labels or {}))
+    
+    def _enqueue(self, entry: tuple):
+        """Append a metric update to the queue, counting the update it evicts when full"""
+        if len(self.metrics_queue) == self.metrics_queue.maxlen:
+            self.metrics_dropped += 1
+        self.metrics_queue.append(entry)
+    
+    def _metric_updater(self, metric_name: str, labels: Dict[str, str]) -> Optional[Callable[[float], None]]:
+        """Resolve the update method (inc/observe/set) of a metric's labelled child"""
+        if metric_name == "rag_query_total":
+            return self.rag_query_counter.labels(**labels).inc
+        elif metric_name == "rag_query_duration_ms":
+            return self.rag_query_duration.labels(**labels).observe
+        elif metric_name == "rag_documents_found":
+            return self.rag_documents_found.labels(**labels).set
+        elif metric_name == "cache_hits_total":
+            return self.cache_hits_counter.labels(**labels).inc
+        elif metric_name == "rag_errors_total":
+            return self.rag_errors_counter.labels(**labels).inc
+        elif metric_name == "health_check_total":
+            return self.health_check_counter.labels(**labels).inc
+        return None
+    
+    def _apply_metric(self, metric_name: str, value: float, labels: Dict[str, str]):
+        """Apply a single metric update to its Prometheus collector"""
         try:
-            if metric_name == "rag_query_total":
-                self.rag_query_counter.labels(**labels).inc(value)
-            elif metric_name == "rag_query_duration_ms":
-                self.rag_query_duration.labels(**labels).observe(value)
-            elif metric_name == "rag_documents_found":
-                self.rag_documents_found.labels(**labels).set(value)
-            elif metric_name == "cache_hits_total":
-                self.cache_hits_counter.labels(**labels).inc(value)
-            elif metric_name == "rag_errors_total":
-                self.rag_errors_counter.labels(**labels).inc(value)
-            elif metric_name == "health_check_total":
-                self.health_check_counter.labels(**labels).inc(value)
+            update = self._metric_updater(metric_name, labels)
+            if update:
+                update(value)
                 
         except Exception as e:
             logger.error(f"❌ Failed to record metric {metric_name}: {e}")
     
+    def bind_metric(self, metric_name: str, labels: Optional[Dict[str, str]] = None) -> Callable[..., None]:
+        """
+        Pre-bind a metric to a fixed label set for hot paths.
+        
+        The label lookup happens once here instead of on every update; the
+        returned recorder still only queues the update for the background drain.
+        """
+        update = None
+        if self.initialized:
+            try:
+                update = self._metric_updater(metric_name, labels or {})
+            except Exception as e:
+                logger.error(f"❌ Failed to bind metric {metric_name}: {e}")
+        
+        if update is None:
+            return lambda value=1: None
+        
+        enqueue = self._enqueue
+        
+        def record(value: float = 1):
+            enqueue((update, value))
+        
+        return record
+    
+    def flush_metrics(self) -> int:
+        """Apply every queued metric update, returning how many were applied"""
+        applied = 0
+        while self.metrics_queue:
+            try:
+                entry = self.metrics_queue.popleft()
+            except IndexError:
+                break
+            if len(entry) == 2:
+                # Pre-bound update from bind_metric()
+                update, value = entry
+                try:
+                    update(value)
+                except Exception as e:
+                    logger.error(f"❌ Failed to record bound metric: {e}")
+            else:
+                self._apply_metric(*entry)
+            applied += 1
+        
+        dropped = self.metrics_dropped - self._metrics_dropped_reported
+        if dropped:
+            self._metrics_dropped_reported += dropped
+            self.metrics_dropped_counter.inc(dropped)
+        return applied
+    
+    async def start_metrics_drain(self, interval_seconds: float = 1.0):
+        """Start the background task that drains queued metrics"""
+        if self._drain_task and not self._drain_task.done():
+            return
+        
+        async def drain_loop():
+            while True:
+                # One failed flush must not stop the drain, or later metrics
+                # would pile up in the queue and be dropped
+                try:
+                    self.flush_metrics()
+                except Exception as e:
+                    logger.error(f"❌ Metrics drain failed: {e}")
+                await asyncio.sleep(interval_seconds)
+        
+        self._drain_task = asyncio.create_task(drain_loop())
+        logger.info("✅ Metrics drain task started")
+    
+    async def stop_metrics_drain(self):
+        """Stop the drain task and flush whatever is still queued"""
+        if self._drain_task:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+        self.flush_metrics()
+    
     def get_metrics(self) -> str:
         """Get metrics in Prometheus format"""
+        return self.get_metrics_bytes().decode('utf-8')
+    
+    def get_metrics_bytes(self) -> bytes:
+        """Get metrics in Prometheus format, already encoded for the response body"""
         if not self.initialized:
-            return "# Observability service not initialized\n"
+            return b"# Observability service not initialized\n"
         
         try:
-            return generate_latest().decode('utf-8')
+            self.flush_metrics()
+            return generate_latest()
         except Exception as e:
             logger.error(f"❌ Failed to generate metrics: {e}")
-            return f"# Error generating metrics: {e}\n"
+            return f"# Error generating metrics: {e}\n".encode()
     
     def get_content_type(self) -> str:
         """Get the Prometheus content type"""
@@ -141,6 +268,8 @@ class SimplifiedObservabilityService:
         return {
             "initialized": self.initialized,
             "metrics_available": self.initialized,
+            "queued_metrics": len(self.metrics_queue),
+            "dropped_metrics": self.metrics_dropped,
             "service": "simplified_prometheus"
         }
 
@@ -4,17 +4,17 @@ import logging
 import time
 import psutil
 import threading
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, Union, BinaryIO
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
-import json
+import orjson
 from collections import deque, defaultdict
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class RequestMetrics:
-    """Metrics for a single request"""
+    """Metrics for a single request (slotted: thousands are kept in history)"""
     timestamp: float
     endpoint: str
     query: str
@@ -47,6 +47,9 @@ class PerformanceMonitor:
         # Request tracking
         self.request_history = deque(maxlen=max_request_history)
         self.request_lock = threading.RLock()
+        # Recorded but not yet aggregated into stats; deque appends/pops are
+        # atomic, so recording a request never takes the lock
+        self._pending_requests = deque()
         
         # System metrics
         self.system_history = deque(maxlen=1440)  # 24 hours at 1-minute intervals
@@ -114,31 +117,42 @@ class PerformanceMonitor:
             user_agent=user_agent
         )
         
+        self.request_history.append(metrics)
+        self._pending_requests.append(metrics)
+        # Readers fold pending records in; bound the backlog if nobody reads
+        if len(self._pending_requests) >= self.max_request_history:
+            self._aggregate_pending()
+    
+    def _aggregate_pending(self):
+        """Fold recorded requests into the global and per-endpoint stats"""
         with self.request_lock:
-            self.request_history.append(metrics)
-            
-            # Update global stats
-            self.stats["total_requests"] += 1
-            if cache_hit:
-                self.stats["cache_hits"] += 1
-            else:
-                self.stats["cache_misses"] += 1
-            
-            if error:
-                self.stats["total_errors"] += 1
-            
-            # Update endpoint stats
-            endpoint_stat = self.endpoint_stats[endpoint]
-            endpoint_stat["requests"] += 1
-            if cache_hit:
-                endpoint_stat["cache_hits"] += 1
-            else:
-                endpoint_stat["cache_misses"] += 1
-            if error:
-                endpoint_stat["errors"] += 1
-            
-            # Update averages
-            self._update_averages(endpoint, duration_ms)
+            while self._pending_requests:
+                self._aggregate(self._pending_requests.popleft())
+    
+    def _aggregate(self, metrics: RequestMetrics):
+        endpoint, cache_hit, error = metrics.endpoint, metrics.cache_hit, metrics.error
+        # Update global stats
+        self.stats["total_requests"] += 1
+        if cache_hit:
+            self.stats["cache_hits"] += 1
+        else:
+            self.stats["cache_misses"] += 1
+        
+        if error:
+            self.stats["total_errors"] += 1
+        
+        # Update endpoint stats
+        endpoint_stat = self.endpoint_stats[endpoint]
+        endpoint_stat["requests"] += 1
+        if cache_hit:
+            endpoint_stat["cache_hits"] += 1
+        else:
+            endpoint_stat["cache_misses"] += 1
+        if error:
+            endpoint_stat["errors"] += 1
+        
+        # Update averages
+        self._update_averages(endpoint, metrics.duration_ms)
     
     def _update_averages(self, endpoint: str, duration_ms: float):
         """Update running averages for performance metrics"""
@@ -195,7 +209,8 @@ class PerformanceMonitor:
         
         async def monitor_loop():
             while self._monitoring:
-                self._record_system_metrics()
+                # cpu_percent(interval=1) sleeps for a second; keep it off the event loop
+                await asyncio.to_thread(self._record_system_metrics)
                 await asyncio.sleep(interval_seconds)
         
         self._monitor_task = asyncio.create_task(monitor_loop())
@@ -214,6 +229,7 @@ class PerformanceMonitor:
     
     def get_performance_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get comprehensive performance summary"""
+        self._aggregate_pending()
         cutoff_time = time.time() - (hours * 3600)
         
         with self.request_lock:
@@ -265,6 +281,7 @@ class PerformanceMonitor:
     
     def get_real_time_stats(self) -> Dict[str, Any]:
         """Get current real-time performance statistics"""
+        self._aggregate_pending()
         # Recent requests (last 5 minutes)
         recent_cutoff = time.time() - 300
         
@@ -300,6 +317,7 @@ class PerformanceMonitor:
     
     def _get_performance_alerts(self) -> List[Dict[str, Any]]:
         """Check for performance issues and generate alerts"""
+        self._aggregate_pending()
         alerts = []
         
         # Check cache hit rate
@@ -333,21 +351,64 @@ class PerformanceMonitor:
         
         return alerts
     
-    def export_metrics(self, filepath: str):
-        """Export all metrics to JSON file for analysis"""
+    def _export_snapshot(self) -> Dict[str, Any]:
+        """Copy the exportable state under the locks (history records are shared, not copied)"""
+        self._aggregate_pending()
         with self.request_lock, self.system_lock:
-            data = {
+            return {
                 "export_timestamp": datetime.now().isoformat(),
-                "stats": self.stats,
-                "endpoint_stats": dict(self.endpoint_stats),
-                "request_history": [asdict(r) for r in self.request_history],
-                "system_history": [asdict(s) for s in self.system_history]
+                "stats": dict(self.stats),
+                "endpoint_stats": {endpoint: dict(stats) for endpoint, stats in self.endpoint_stats.items()},
+                "request_history": list(self.request_history),
+                "system_history": list(self.system_history)
             }
+    
+    def iter_export_chunks(self, records_per_chunk: int = 500) -> Iterator[bytes]:
+        """
+        Yield the metrics export as consecutive pieces of one JSON document.
+        
+        History lists are serialized a slice at a time, so the full encoded
+        export never has to sit in memory alongside the snapshot.
+        """
+        # Serialize outside the locks so recording requests isn't held up
+        snapshot = self._export_snapshot()
+        
+        yield b"{"
+        for position, (key, value) in enumerate(snapshot.items()):
+            if position:
+                yield b","
+            yield orjson.dumps(key) + b":"
+            
+            if not isinstance(value, list):
+                yield orjson.dumps(value)
+                continue
+            
+            yield b"["
+            for start in range(0, len(value), records_per_chunk):
+                if start:
+                    yield b","
+                # orjson encodes the dataclass records natively; drop the slice's brackets
+                yield orjson.dumps(value[start:start + records_per_chunk])[1:-1]
+            yield b"]"
+        yield b"}"
+    
+    def build_export_payload(self) -> bytes:
+        """Snapshot all metrics as an encoded JSON document"""
+        return b"".join(self.iter_export_chunks())
+    
+    def export_metrics(self, target: Union[str, BinaryIO]):
+        """Export all metrics as JSON to a file path or an already open binary file"""
+        if not isinstance(target, str):
+            for chunk in self.iter_export_chunks():
+                target.write(chunk)
+            return
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        # A 1 MiB buffer turns the many small chunks into few write() calls
+        with open(target, 'wb', buffering=1 << 20) as f:
+            for chunk in self.iter_export_chunks():
+                f.write(chunk)
         
-        logger.info(f"Metrics exported to {filepath}")
+        logger.info(f"Metrics exported to {target}")
     
     def _get_current_stats(self) -> Dict[str, Any]:
         """Get current performance statistics (alias for backward compatibility)"""
@@ -355,6 +416,7 @@ class PerformanceMonitor:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get comprehensive performance statistics"""
+        self._aggregate_pending()
         with self.request_lock:
             # Calculate cache hit rate
             total_cache_requests = self.stats["cache_hits"] + self.stats["cache_misses"]
@@ -7,6 +7,21 @@ import re
 from typing import Dict, Any, List
 from datetime import datetime
 import asyncio
+from functools import lru_cache
+
+@lru_cache(maxsize=256)
+def _grade_for_bucket(score_thousandths: int) -> str:
+    """Letter grade for a quality score expressed in thousandths"""
+    if score_thousandths >= 900:
+        return "A"
+    elif score_thousandths >= 800:
+        return "B" 
+    elif score_thousandths >= 700:
+        return "C"
+    elif score_thousandths >= 600:
+        return "D"
+    else:
+        return "F"
 
 class ResponseQualityMonitor:
     def __init__(self):
@@ -125,16 +140,9 @@ class ResponseQualityMonitor:
     
     def _get_quality_grade(self, score: float) -> str:
         """Convert numeric score to letter grade"""
-        if score >= 0.9:
-            return "A"
-        elif score >= 0.8:
-            return "B" 
-        elif score >= 0.7:
-            return "C"
-        elif score >= 0.6:
-            return "D"
-        else:
-            return "F"
+        # Grade boundaries are whole thousandths, so flooring to a thousandth
+        # bucket never moves a score across one and repeated scores hit the cache
+        return _grade_for_bucket(int(score * 1000))
     
     def get_quality_analytics(self, time_window_hours: int = 24) -> Dict[str, Any]:
         """Get quality analytics for the specified time window"""
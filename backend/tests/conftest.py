@@ -0,0 +1,11 @@
+import sys
+import pytest
+
+@pytest.fixture(autouse=True)
+def reset_shared_chains():
+    """Drop the app's cached QA chain and agent so patched factories take effect"""
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module._rag_chain = None
+        app_module._react_agent = None
+    yield
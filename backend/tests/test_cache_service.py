@@ -7,7 +7,8 @@ import asyncio
 os.environ["TESTING"] = "true"
 os.environ["LANGCHAIN_TRACING_V2"] = "false"
 
-from cache_service import CacheService
+from cachetools import TTLCache
+from cache_service import CacheService, SemanticCacheMatrix, cache_service
 
 class TestCacheService:
     """Test cases for the caching service"""
@@ -56,9 +57,21 @@ class TestCacheService:
         # Try to get a non-existent cached result
         cached_result = await cache.get_cached_result("non-existent query")
         assert cached_result is None
-        
+
         await cache.close()
-    
+
+    @pytest.mark.asyncio
+    async def test_cache_key_normalization(self):
+        """Test that case, whitespace and Unicode-width variants share a cache key"""
+        cache = CacheService()
+
+        key = cache._get_cache_key("HB 55 education funding")
+        assert cache._get_cache_key("  hb 55   Education\tfunding ") == key
+        assert cache._get_cache_key("ＨＢ ５５ education funding") == key
+        assert cache._get_cache_key("HB 56 education funding") != key
+
+        await cache.close()
+
     @pytest.mark.asyncio
     async def test_similarity_matching(self):
         """Test cache similarity matching for related queries"""
@@ -85,6 +98,22 @@ class TestCacheService:
         
         await cache.close()
     
+    @pytest.mark.asyncio
+    async def test_similarity_hit_after_result_expired(self):
+        """Test a similarity entry whose result has expired is treated as a miss"""
+        cache = CacheService()
+        await cache.initialize()
+        
+        await cache.set_cached_result("education funding bills", {"result": "Education funding information"})
+        assert (await cache.get_cached_result("funding bills education"))["result"] == "Education funding information"
+        
+        # Results expire before the (longer-lived) similarity entries
+        cache.memory_cache.clear()
+        assert await cache.get_cached_result("education funding bills") is None
+        assert await cache.get_cached_result("funding bills education") is None
+        
+        await cache.close()
+    
     @pytest.mark.asyncio
     async def test_cache_clear(self):
         """Test cache clearing functionality"""
@@ -143,3 +172,138 @@ class TestCacheService:
             assert result is not None
         
         await cache.close()
+    
+    @pytest.mark.asyncio
+    async def test_semantic_lookup_with_matching_evidence(self):
+        """Test semantic cache hit when the evidence is unchanged"""
+        cache = CacheService()
+        await cache.initialize()
+        
+        docs = [
+            MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55", "last_action": "Filed"}),
+            MagicMock(page_content="SB 31", metadata={"bill_id": "SB 31", "last_action": "Passed"})
+        ]
+        embedding = [1.0, 0.0, 0.0]
+        await cache.set_cached_result(
+            "education funding bills",
+            {"result": "Education funding information", "documents_found": 2},
+            query_embedding=embedding,
+            source_documents=docs
+        )
+        
+        # Near-identical embedding for a paraphrased query
+        candidates = await cache.semantic_lookup([0.99, 0.05, 0.0])
+        assert len(candidates) == 1
+        assert candidates[0]["query"] == "education funding bills"
+        assert cache.validate_evidence(candidates[0], docs) is True
+        
+        # Unrelated embedding should not be a candidate
+        assert await cache.semantic_lookup([0.0, 1.0, 0.0]) == []
+        
+        await cache.close()
+    
+    @pytest.mark.asyncio
+    async def test_identical_document_set_admits_looser_matches(self):
+        """Test a looser query match is served only when the exact same documents come back"""
+        docs = [
+            MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55"}),
+            MagicMock(page_content="SB 31", metadata={"bill_id": "SB 31"}),
+            MagicMock(page_content="HB 82", metadata={"bill_id": "HB 82"}),
+            MagicMock(page_content="HB 90", metadata={"bill_id": "HB 90"})
+        ]
+        looser = [0.88, 0.475, 0.0]
+
+        strict = CacheService()
+        await strict.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+        assert await strict.semantic_lookup(looser) == []
+        # Even with the exact same documents, a 0.85-0.92 match is not a candidate when off
+        off = CacheService(semantic_threshold=0.92)
+        await off.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+        assert off.doc_set_threshold is None
+        assert cache_service.doc_set_threshold is None
+        assert await off.semantic_lookup(looser) == []
+
+        cache = CacheService(doc_set_threshold=0.85)
+        await cache.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+        candidate = (await cache.semantic_lookup(looser))[0]
+        assert cache.validate_evidence(candidate, docs) is True
+        # Overlapping (Jaccard 0.75) but not identical evidence is not enough here
+        assert cache.validate_evidence(candidate, docs[:3]) is False
+
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_semantic_entries_outlive_exact_matches(self):
+        """Test a semantic TTL keeps paraphrase candidates after the exact entry expires"""
+        assert CacheService(memory_ttl=300).semantic_cache.ttl == 300
+
+        cache = CacheService(memory_ttl=0.05, semantic_ttl=60)
+        docs = [MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55"})]
+        await cache.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+
+        await asyncio.sleep(0.1)
+        assert await cache.get_cached_result("education funding") is None
+        assert [c["query"] for c in await cache.semantic_lookup([1.0, 0.0, 0.0])] == ["education funding"]
+
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_semantic_lookup_rejects_changed_evidence(self):
+        """Test semantic cache candidates are rejected when evidence differs"""
+        cache = CacheService()
+        await cache.initialize()
+        
+        docs = [
+            MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55", "last_action": "Filed"}),
+            MagicMock(page_content="SB 31", metadata={"bill_id": "SB 31", "last_action": "Filed"})
+        ]
+        await cache.set_cached_result(
+            "education funding bills",
+            {"result": "Education funding information", "documents_found": 2},
+            query_embedding=[1.0, 0.0, 0.0],
+            source_documents=docs
+        )
+        candidate = (await cache.semantic_lookup([1.0, 0.0, 0.0]))[0]
+        
+        # Different documents retrieved (low Jaccard overlap)
+        other_docs = [MagicMock(page_content="HB 9", metadata={"bill_id": "HB 9"})]
+        assert cache.validate_evidence(candidate, other_docs) is False
+        
+        # Same documents, but one was updated since the answer was cached
+        updated_docs = [
+            MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55", "last_action": "Passed"}),
+            docs[1]
+        ]
+        assert cache.validate_evidence(candidate, updated_docs) is False
+        
+        await cache.close()
+    
+    @pytest.mark.asyncio
+    async def test_semantic_matrix_rows_track_the_cache(self):
+        """Test embeddings are written into matrix rows in place and freed on eviction"""
+        cache = CacheService()
+        await cache.initialize()
+        
+        docs = [MagicMock(page_content="HB 55", metadata={"bill_id": "HB 55"})]
+        await cache.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+        
+        matrix = cache.semantic_matrix.matrix
+        await cache.set_cached_result("school vouchers", {"result": "b"}, query_embedding=[0.0, 1.0, 0.0], source_documents=docs)
+        assert cache.semantic_matrix.matrix is matrix
+        candidates = await cache.semantic_lookup([0.0, 1.0, 0.0])
+        assert [c["query"] for c in candidates] == ["school vouchers"]
+        
+        # A full cache evicts an entry and reuses its row for the newcomer
+        cache.semantic_cache = TTLCache(maxsize=2, ttl=300)
+        cache.semantic_matrix = SemanticCacheMatrix(2)
+        await cache.set_cached_result("education funding", {"result": "a"}, query_embedding=[1.0, 0.0, 0.0], source_documents=docs)
+        await cache.set_cached_result("school vouchers", {"result": "b"}, query_embedding=[0.0, 1.0, 0.0], source_documents=docs)
+        await cache.set_cached_result("water rights", {"result": "c"}, query_embedding=[0.0, 0.0, 1.0], source_documents=docs)
+        assert len(cache.semantic_matrix.rows) == len(cache.semantic_cache) == 2
+        assert await cache.semantic_lookup([1.0, 0.0, 0.0]) == []
+        assert [c["query"] for c in await cache.semantic_lookup([0.0, 0.0, 1.0])] == ["water rights"]
+        
+        await cache.clear_cache()
+        assert await cache.semantic_lookup([1.0, 0.0, 0.0]) == []
+        
+        await cache.close()
@@ -21,7 +21,7 @@ class TestCoreRAGFunctionality:
     async def test_rag_query_basic_success(self):
         """Test basic successful RAG query processing"""
         with patch('app.vectorstore') as mock_vectorstore, \
-             patch('app.RetrievalQA') as mock_qa:
+             patch('app.load_qa_chain') as mock_qa:
             
             # Mock the retriever and documents
             mock_retriever = MagicMock()
@@ -32,13 +32,12 @@ class TestCoreRAGFunctionality:
             mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
-            # Mock the RetrievalQA chain
+            # Mock the QA chain
             mock_chain = MagicMock()
-            mock_chain.return_value = {
-                "result": "HB 55 addresses education funding based on property values.",
-                "source_documents": [mock_doc]
-            }
-            mock_qa.from_chain_type.return_value = mock_chain
+            mock_chain.ainvoke = AsyncMock(return_value={
+                "output_text": "HB 55 addresses education funding based on property values."
+            })
+            mock_qa.return_value = mock_chain
             
             # Test the query
             request = QueryRequest(query="education funding")
@@ -87,7 +86,7 @@ class TestCoreRAGFunctionality:
     async def test_rag_query_multiple_documents(self):
         """Test RAG query with multiple documents"""
         with patch('app.vectorstore') as mock_vectorstore, \
-             patch('app.RetrievalQA') as mock_qa:
+             patch('app.load_qa_chain') as mock_qa:
             
             mock_retriever = MagicMock()
             mock_docs = [
@@ -105,11 +104,10 @@ class TestCoreRAGFunctionality:
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
             mock_chain = MagicMock()
-            mock_chain.return_value = {
-                "result": "Multiple bills found: HB 55 for education and SB 120 for healthcare.",
-                "source_documents": mock_docs
-            }
-            mock_qa.from_chain_type.return_value = mock_chain
+            mock_chain.ainvoke = AsyncMock(return_value={
+                "output_text": "Multiple bills found: HB 55 for education and SB 120 for healthcare."
+            })
+            mock_qa.return_value = mock_chain
             
             request = QueryRequest(query="legislation review")
             result = await rag_query(request)
@@ -125,6 +123,15 @@ class TestAPIEndpoints:
         """Set up test client"""
         self.client = TestClient(app)
     
+    def test_routes_registered_once(self):
+        """Test no route is shadowed by a duplicate definition and the optimized lifespan is wired"""
+        import app as app_module
+        
+        routes = [(route.path, method) for route in app.routes for method in getattr(route, "methods", None) or ()]
+        assert len(routes) == len(set(routes))
+        assert len([r for r in app.routes if r.path == "/rag"]) == 1
+        assert app.router.lifespan_context is app_module.lifespan
+    
     def test_health_endpoint(self):
         """Test health check endpoint"""
         response = self.client.get("/health")
@@ -165,7 +172,7 @@ class TestAPIEndpoints:
         assert "message" in data
     
     @patch('app.vectorstore')
-    @patch('app.RetrievalQA')
+    @patch('app.load_qa_chain')
     def test_rag_endpoint_integration(self, mock_qa, mock_vectorstore):
         """Test full RAG endpoint integration"""
         # Mock successful retrieval
@@ -177,11 +184,10 @@ class TestAPIEndpoints:
         mock_vectorstore.as_retriever.return_value = mock_retriever
         
         mock_chain = MagicMock()
-        mock_chain.return_value = {
-            "result": "Integration test response about HB 1",
-            "source_documents": [mock_doc]
-        }
-        mock_qa.from_chain_type.return_value = mock_chain
+        mock_chain.ainvoke = AsyncMock(return_value={
+            "output_text": "Integration test response about HB 1"
+        })
+        mock_qa.return_value = mock_chain
         
         # Test the endpoint
         response = self.client.post("/rag", json={"query": "integration test"})
@@ -343,7 +349,7 @@ class TestPerformanceRequirements:
     async def test_response_time_acceptable(self):
         """Test that response times are reasonable"""
         with patch('app.vectorstore') as mock_vectorstore, \
-             patch('app.RetrievalQA') as mock_qa:
+             patch('app.load_qa_chain') as mock_qa:
             
             mock_retriever = MagicMock()
             mock_doc = MagicMock()
@@ -353,11 +359,10 @@ class TestPerformanceRequirements:
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
             mock_chain = MagicMock()
-            mock_chain.return_value = {
-                "result": "Performance test response",
-                "source_documents": [mock_doc]
-            }
-            mock_qa.from_chain_type.return_value = mock_chain
+            mock_chain.ainvoke = AsyncMock(return_value={
+                "output_text": "Performance test response"
+            })
+            mock_qa.return_value = mock_chain
             
             # Measure response time
             start_time = time.time()
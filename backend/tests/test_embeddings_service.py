@@ -20,7 +20,7 @@ class MockVoyageClient:
             return MagicMock(embeddings=[[0.1] * 1024])
 
 with patch('embeddings_service.VoyageClient', MockVoyageClient):
-    from embeddings_service import OptimizedEmbeddingsService
+    from embeddings_service import OptimizedEmbeddingsService, EmbeddingBatcher
 
 class TestOptimizedEmbeddingsService:
     """Test cases for the optimized embeddings service"""
@@ -108,6 +108,24 @@ class TestOptimizedEmbeddingsService:
         
         await service.close()
     
+    @pytest.mark.asyncio
+    async def test_local_embedding_cache_is_bounded(self):
+        """Test the process-local query LRU evicts least recently used vectors"""
+        service = OptimizedEmbeddingsService(api_key="test_key", model="voyage-3.5")
+        service.client = MockVoyageClient()
+        service.cache = type(service.cache)(maxsize=2)
+        
+        await service.embed_query("first query")
+        await service.embed_query("second query")
+        await service.embed_query("first query")  # refresh recency
+        await service.embed_query("third query")
+        
+        assert len(service.cache) == 2
+        assert service._get_cache_key("first query", "query") in service.cache
+        assert service._get_cache_key("second query", "query") not in service.cache
+        
+        await service.close()
+    
     @pytest.mark.asyncio
     async def test_cache_warm_up(self):
         """Test cache warm-up functionality"""
@@ -131,6 +149,36 @@ class TestOptimizedEmbeddingsService:
         
         await service.close()
     
+    @pytest.mark.asyncio
+    async def test_concurrent_cache_warm_up_is_bounded(self):
+        """Test concurrent warm-up embeds every query without exceeding the concurrency limit"""
+        service = OptimizedEmbeddingsService(
+            api_key="test_key",
+            model="voyage-3.5"
+        )
+        
+        in_flight = 0
+        peak = 0
+        warmed = []
+        
+        async def fake_embed_query(text):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            warmed.append(text)
+            return [0.1] * 1024
+        
+        queries = [f"warm-up query {i}" for i in range(40)]
+        with patch.object(service, "embed_query", side_effect=fake_embed_query):
+            await service.warm_cache_concurrent(queries, concurrency=8)
+        
+        assert sorted(warmed) == sorted(queries)
+        assert peak == 8
+        
+        await service.close()
+    
     @pytest.mark.asyncio
     async def test_batch_processing_large_dataset(self):
         """Test batch processing with large dataset"""
@@ -150,6 +198,34 @@ class TestOptimizedEmbeddingsService:
         
         await service.close()
     
+    @pytest.mark.asyncio
+    async def test_document_batches_respect_character_budget(self):
+        """Test documents are packed under the per-call character budget and returned in input order"""
+        service = OptimizedEmbeddingsService(
+            api_key="test_key",
+            model="voyage-3.5",
+            batch_size=4,
+            max_batch_chars=100
+        )
+        calls = []
+        
+        def fake_embed(texts, **kwargs):
+            calls.append(list(texts))
+            return MagicMock(embeddings=[[float(len(text))] for text in texts])
+        
+        service.client = MagicMock(embed=fake_embed)
+        documents = [f"budget doc {i} " + "x" * length for i, length in enumerate([80, 5, 60, 5, 5, 5, 5, 30])]
+        
+        with patch('embeddings_service.cache_service.get_cached_result', AsyncMock(return_value=None)), \
+             patch('embeddings_service.cache_service.set_cached_result', AsyncMock()):
+            embeddings = await service.embed_documents(documents)
+        
+        assert embeddings == [[float(len(doc))] for doc in documents]
+        assert all(len(batch) <= 4 and sum(map(len, batch)) <= 100 for batch in calls)
+        assert sorted(text for batch in calls for text in batch) == sorted(documents)
+        
+        await service.close()
+    
     @pytest.mark.asyncio
     async def test_concurrent_requests(self):
         """Test handling of concurrent embedding requests"""
@@ -324,3 +400,72 @@ class TestOptimizedEmbeddingsService:
         service2 = OptimizedEmbeddingsService(api_key="test_key")
         assert service2.batch_size > 0
         assert service2.max_workers > 0
+
+
+class TestEmbeddingBatcher:
+    """Test cases for the query embedding micro-batcher"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_are_coalesced(self):
+        """Concurrent submissions should share embed calls and get their own vectors back"""
+        calls = []
+        
+        def embed_fn(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        
+        batcher = EmbeddingBatcher(embed_fn, max_batch_size=64, max_wait_ms=5)
+        queries = [f"query {'x' * i}" for i in range(10)]
+        
+        results = await asyncio.gather(*[batcher.submit(q) for q in queries])
+        
+        assert results == [[float(len(q))] for q in queries]
+        assert len(calls) < len(queries)
+        assert sum(len(batch) for batch in calls) == len(queries)
+        
+        await batcher.close()
+    
+    @pytest.mark.asyncio
+    async def test_in_flight_batches_are_bounded(self):
+        """Slow embed calls overlap, but never more than max_in_flight at once"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+        
+        def embed_fn(texts):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return [[1.0] for _ in texts]
+        
+        executor = ThreadPoolExecutor(max_workers=8)
+        batcher = EmbeddingBatcher(embed_fn, executor=executor, max_batch_size=1, max_in_flight=3)
+        
+        results = await asyncio.gather(*[batcher.submit(f"query {i}") for i in range(12)])
+        
+        assert results == [[1.0]] * 12
+        assert 1 < peak <= 3
+        
+        await batcher.close()
+        executor.shutdown(wait=True)
+    
+    @pytest.mark.asyncio
+    async def test_batch_errors_propagate_to_callers(self):
+        """A failed embed call should fail every request in that batch"""
+        def embed_fn(texts):
+            raise RuntimeError("voyage unavailable")
+        
+        batcher = EmbeddingBatcher(embed_fn)
+        
+        with pytest.raises(RuntimeError):
+            await batcher.submit("education funding")
+        
+        await batcher.close()
@@ -49,6 +49,21 @@ class TestPerformanceMonitor:
         assert request.status_code == 200
         assert hasattr(request, 'timestamp')
     
+    def test_stats_aggregated_when_read(self):
+        """Test recording defers stats aggregation until the stats are read"""
+        monitor = PerformanceMonitor()
+
+        monitor.record_request(endpoint="/rag", query="a", duration_ms=100.0, cache_hit=True)
+        monitor.record_request(endpoint="/rag", query="b", duration_ms=300.0, error=True, status_code=500)
+        assert monitor.stats["total_requests"] == 0
+
+        stats = monitor.get_stats()
+        assert stats["total_requests"] == 2
+        assert stats["cache_hits"] == 1
+        assert stats["total_errors"] == 1
+        assert stats["avg_response_time_ms"] == 200.0
+        assert stats["endpoint_breakdown"]["/rag"]["requests"] == 2
+
     def test_record_error_request(self):
         """Test recording error request metrics"""
         monitor = PerformanceMonitor()
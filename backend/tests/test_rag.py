@@ -23,7 +23,7 @@ class TestRAGSystem:
     async def test_rag_query_success(self):
         """Test successful RAG query processing"""
         with patch('app.vectorstore') as mock_vectorstore, \
-             patch('app.RetrievalQA') as mock_qa:
+             patch('app.load_qa_chain') as mock_qa:
             
             # Mock the retriever and documents
             mock_retriever = MagicMock()
@@ -38,13 +38,12 @@ class TestRAGSystem:
             mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
-            # Mock the RetrievalQA chain
+            # Mock the QA chain
             mock_chain = MagicMock()
-            mock_chain.return_value = {
-                "result": "Several bills in session 891 relate to education funding. HB 55 concerns funding based on property values.",
-                "source_documents": [mock_doc]
-            }
-            mock_qa.from_chain_type.return_value = mock_chain
+            mock_chain.ainvoke = AsyncMock(return_value={
+                "output_text": "Several bills in session 891 relate to education funding. HB 55 concerns funding based on property values."
+            })
+            mock_qa.return_value = mock_chain
             
             # Create a request object
             request = QueryRequest(query="education funding")
@@ -100,14 +99,13 @@ class TestRAGSystem:
             mock_retriever.get_relevant_documents = MagicMock(return_value=mock_docs)
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
-            # Mock the RetrievalQA chain
-            with patch('app.RetrievalQA') as mock_qa:
+            # Mock the QA chain
+            with patch('app.load_qa_chain') as mock_qa:
                 mock_chain = MagicMock()
-                mock_chain.return_value = {
-                    "result": "Several bills relate to education: **HB 55** for funding, **HB 82** for enrollment, and **SB 31** for tax relief.",
-                    "source_documents": mock_docs
-                }
-                mock_qa.from_chain_type.return_value = mock_chain
+                mock_chain.ainvoke = AsyncMock(return_value={
+                    "output_text": "Several bills relate to education: **HB 55** for funding, **HB 82** for enrollment, and **SB 31** for tax relief."
+                })
+                mock_qa.return_value = mock_chain
                 
                 request = QueryRequest(query="education bills")
                 result = await rag_query(request)
@@ -159,14 +157,13 @@ class TestRAGSystem:
             mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
             mock_vectorstore.as_retriever.return_value = mock_retriever
             
-            # Mock the RetrievalQA chain
-            with patch('app.RetrievalQA') as mock_qa:
+            # Mock the QA chain
+            with patch('app.load_qa_chain') as mock_qa:
                 mock_chain = MagicMock()
-                mock_chain.return_value = {
-                    "result": "In session 891, HB 55 addresses education funding based on property values.",
-                    "source_documents": [mock_doc]
-                }
-                mock_qa.from_chain_type.return_value = mock_chain
+                mock_chain.ainvoke = AsyncMock(return_value={
+                    "output_text": "In session 891, HB 55 addresses education funding based on property values."
+                })
+                mock_qa.return_value = mock_chain
                 
                 request = QueryRequest(query="session 891 education bills")
                 result = await rag_query(request)
@@ -203,14 +200,13 @@ async def test_rag_endpoint_integration():
         mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
         mock_vectorstore.as_retriever.return_value = mock_retriever
         
-        # Mock the RetrievalQA chain
-        with patch('app.RetrievalQA') as mock_qa:
+        # Mock the QA chain
+        with patch('app.load_qa_chain') as mock_qa:
             mock_chain = MagicMock()
-            mock_chain.return_value = {
-                "result": "This is a test response about HB 1.",
-                "source_documents": [mock_doc]
-            }
-            mock_qa.from_chain_type.return_value = mock_chain
+            mock_chain.ainvoke = AsyncMock(return_value={
+                "output_text": "This is a test response about HB 1."
+            })
+            mock_qa.return_value = mock_chain
             
             client = TestClient(app)
             response = client.post("/rag", json={"query": "test query"})
@@ -220,6 +216,274 @@ async def test_rag_endpoint_integration():
         assert "result" in data
         assert "documents_found" in data
         assert data["documents_found"] == 1
+        mock_vectorstore.as_retriever.assert_called_once_with(search_kwargs={"k": 4})
+
+@pytest.mark.asyncio
+async def test_rag_endpoint_streaming():
+    """Streaming requests emit a metadata event, token events, then a final result event"""
+    from fastapi.testclient import TestClient
+
+    async def fake_astream(prompt, **kwargs):
+        for token in ["HB 7 ", "funds ", "schools."]:
+            yield MagicMock(content=token)
+
+    with patch('app.vectorstore') as mock_vectorstore, \
+         patch('app.model') as mock_llm:
+
+        mock_retriever = MagicMock()
+        mock_doc = MagicMock()
+        mock_doc.page_content = "HB 7 funds schools"
+        mock_doc.metadata = {"bill_id": "HB 7", "title": "School Funding"}
+
+        mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
+        mock_vectorstore.as_retriever.return_value = mock_retriever
+        mock_llm.astream = fake_astream
+
+        client = TestClient(app)
+        response = client.post("/rag", json={"query": "streaming school funding", "stream": True})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    event_types = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert event_types == ["meta", "final"]
+    meta, final = json.loads(events[0]), json.loads(events[-1])
+    assert meta == {"query": "streaming school funding", "documents_found": 1}
+    assert [json.loads(e)["token"] for e in events[1:-1]] == ["HB 7 ", "funds ", "schools."]
+    assert "**HB 7** funds schools." in final["result"]
+    assert final["documents_found"] == 1
+
+def test_rag_streaming_failures_end_with_error_event():
+    """Failures before or after the tokens are streamed both end the stream with an error event"""
+    from fastapi.testclient import TestClient
+
+    async def fake_astream(prompt, **kwargs):
+        yield MagicMock(content="HB 7 funds schools.")
+
+    def event_types(response):
+        return [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+
+    client = TestClient(app)
+    with patch('app.vectorstore') as mock_vectorstore, \
+         patch('app.model') as mock_llm, \
+         patch('app.cache_service.set_cached_result', AsyncMock(side_effect=RuntimeError("cache down"))):
+
+        mock_doc = MagicMock(page_content="HB 7 funds schools", metadata={"bill_id": "HB 7"})
+        mock_vectorstore.as_retriever.return_value.get_relevant_documents = MagicMock(return_value=[mock_doc])
+        mock_llm.astream = fake_astream
+
+        response = client.post("/rag", json={"query": "streaming finalize failure", "stream": True})
+    assert event_types(response) == ["meta", "error"]
+
+    with patch('app.vectorstore') as mock_vectorstore:
+        mock_vectorstore.as_retriever.side_effect = Exception("Database error")
+        response = client.post("/rag", json={"query": "streaming search failure", "stream": True})
+    assert event_types(response) == ["error"]
+
+@pytest.mark.asyncio
+async def test_rag_query_uses_native_grpc_search():
+    """gRPC-backed search awaits the index future and skips the sync retriever"""
+    from concurrent.futures import Future
+
+    future = Future()
+    future.set_result(MagicMock(matches=[
+        MagicMock(metadata={"text": "HB 12 expands broadband access.", "bill_id": "HB 12"})
+    ]))
+    mock_index = MagicMock()
+    mock_index.query.return_value = future
+
+    with patch('app.vectorstore') as mock_vectorstore, \
+         patch('app.pinecone_index', mock_index), \
+         patch('app.use_grpc_queries', True), \
+         patch('app.load_qa_chain') as mock_qa:
+
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "HB 12 expands broadband access."})
+        mock_qa.return_value = mock_chain
+
+        result = await rag_query(QueryRequest(query="rural broadband grpc"))
+
+    mock_vectorstore.as_retriever.assert_not_called()
+    assert mock_index.query.call_args.kwargs["async_req"] is True
+    assert result["documents_found"] == 1
+    docs = mock_chain.ainvoke.call_args.args[0]["input_documents"]
+    assert docs[0].page_content == "HB 12 expands broadband access."
+    assert docs[0].metadata == {"bill_id": "HB 12"}
+
+@pytest.mark.asyncio
+async def test_rag_query_rest_search_reuses_query_embedding():
+    """Without gRPC the REST index is queried by vector instead of re-embedding via the retriever"""
+    mock_index = MagicMock()
+    mock_index.query.return_value = MagicMock(matches=[
+        MagicMock(metadata={"text": "SB 4 funds rural clinics.", "bill_id": "SB 4"})
+    ])
+
+    with patch('app.vectorstore') as mock_vectorstore, \
+         patch('app.pinecone_index', mock_index), \
+         patch('app.use_grpc_queries', False), \
+         patch('app.load_qa_chain') as mock_qa:
+
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "SB 4 funds rural clinics."})
+        mock_qa.return_value = mock_chain
+
+        result = await rag_query(QueryRequest(query="rural clinic funding rest"))
+
+    mock_vectorstore.as_retriever.assert_not_called()
+    assert "async_req" not in mock_index.query.call_args.kwargs
+    assert len(mock_index.query.call_args.kwargs["vector"]) > 0
+    assert result["documents_found"] == 1
+
+@pytest.mark.asyncio
+async def test_rag_query_rest_search_uses_asyncio_client():
+    """With the asyncio REST client open, vector queries await it instead of the thread pool"""
+    mock_index = MagicMock()
+    mock_async_index = MagicMock()
+    mock_async_index.query = AsyncMock(return_value=MagicMock(matches=[
+        MagicMock(metadata={"text": "HB 21 caps tuition increases.", "bill_id": "HB 21"})
+    ]))
+
+    with patch('app.vectorstore'), \
+         patch('app.pinecone_index', mock_index), \
+         patch('app.pinecone_async_index', mock_async_index), \
+         patch('app.use_grpc_queries', False), \
+         patch('app.load_qa_chain') as mock_qa:
+
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "HB 21 caps tuition increases."})
+        mock_qa.return_value = mock_chain
+
+        result = await rag_query(QueryRequest(query="tuition cap asyncio"))
+
+    mock_index.query.assert_not_called()
+    mock_async_index.query.assert_awaited_once()
+    assert result["documents_found"] == 1
+
+@pytest.mark.asyncio
+async def test_query_index_merges_namespaces_by_score():
+    """Configured namespaces are searched in parallel and the best matches kept"""
+    from app import query_index_async
+
+    responses = {
+        "session-88": [MagicMock(score=0.71, metadata={"text": "HB 3 (88th)", "bill_id": "HB 3"}),
+                       MagicMock(score=0.52, metadata={"text": "HB 9 (88th)", "bill_id": "HB 9"})],
+        "session-89": [MagicMock(score=0.93, metadata={"text": "SB 2 (89th)", "bill_id": "SB 2"})],
+    }
+
+    async def fake_query(**kwargs):
+        return MagicMock(matches=responses[kwargs["namespace"]])
+
+    mock_async_index = MagicMock()
+    mock_async_index.query = AsyncMock(side_effect=fake_query)
+
+    with patch('app.pinecone_async_index', mock_async_index), \
+         patch('app.use_grpc_queries', False), \
+         patch('app.PINECONE_NAMESPACES', ["session-88", "session-89"]):
+        docs = await query_index_async([0.1] * 1024, top_k=2)
+
+    assert mock_async_index.query.await_count == 2
+    assert [doc.metadata["bill_id"] for doc in docs] == ["SB 2", "HB 3"]
+
+@pytest.mark.asyncio
+async def test_rerank_trims_candidates_before_the_llm():
+    """With reranking on, more candidates are fetched and only the top reranked ones reach the chain"""
+    mock_async_index = MagicMock()
+    mock_async_index.query = AsyncMock(return_value=MagicMock(matches=[
+        MagicMock(metadata={"text": f"Bill {i} text", "bill_id": f"HB {i}"}) for i in range(10)
+    ]))
+    mock_vo = MagicMock()
+    mock_vo.rerank.return_value = MagicMock(results=[MagicMock(index=7), MagicMock(index=2)])
+
+    with patch('app.vectorstore'), \
+         patch('app.pinecone_index', MagicMock()), \
+         patch('app.pinecone_async_index', mock_async_index), \
+         patch('app.use_grpc_queries', False), \
+         patch('app.vo', mock_vo), \
+         patch('app.RAG_RERANK_TOP_N', 2), \
+         patch('app.load_qa_chain') as mock_qa:
+
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "HB 7 and HB 2."})
+        mock_qa.return_value = mock_chain
+
+        result = await rag_query(QueryRequest(query="rerank candidate trimming"))
+
+    assert mock_async_index.query.call_args.kwargs["top_k"] == 10
+    assert mock_vo.rerank.call_args.kwargs["top_k"] == 2
+    chain_docs = mock_chain.ainvoke.call_args.args[0]["input_documents"]
+    assert [doc.metadata["bill_id"] for doc in chain_docs] == ["HB 7", "HB 2"]
+    assert result["documents_found"] == 2
+
+def test_agent_batch_bill_lookup_tool():
+    """The batch DB tool resolves several comma-separated bill IDs in one call"""
+    from app import tools, query_db_batch
+
+    assert {tool.name for tool in tools} == {"DBQuery", "DBQueryBatch"}
+    assert [bill["bill_id"] for bill in query_db_batch("HB 1, SB 2,, HB 3 ")] == ["HB 1", "SB 2", "HB 3"]
+
+@pytest.mark.asyncio
+async def test_aembed_documents_splits_into_ordered_batches():
+    """Document embedding is split under the per-request cap and reassembled in input order"""
+    from app import VoyageEmbeddings
+
+    mock_client = MagicMock()
+    mock_client.embed.side_effect = lambda texts, **kwargs: [[float(text)] for text in texts]
+    voyage = VoyageEmbeddings(mock_client)
+
+    with patch('app.VOYAGE_BATCH_MAX_TEXTS', 2):
+        embeddings = await voyage.aembed_documents(["1", "2", "3", "4", "5"])
+        assert voyage.embed_documents(["6", "7", "8"]) == [[6.0], [7.0], [8.0]]
+
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert [len(call.args[0]) for call in mock_client.embed.call_args_list[:3]] == [2, 2, 1]
+
+@pytest.mark.asyncio
+async def test_prewarm_rag_runs_the_chain_without_caching():
+    """The startup warm-up reaches the LLM but leaves nothing in the answer cache"""
+    from app import prewarm_rag, cache_service
+
+    with patch('app.load_qa_chain') as mock_qa:
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "warm"})
+        mock_qa.return_value = mock_chain
+
+        await prewarm_rag("warm-up healthcare query")
+
+    assert mock_chain.ainvoke.call_args.args[0]["question"] == "warm-up healthcare query"
+    assert await cache_service.get_cached_result("warm-up healthcare query") is None
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_share_one_pipeline_run():
+    """Identical in-flight queries join the first request instead of re-running the chain"""
+    import asyncio
+
+    with patch('app.vectorstore') as mock_vectorstore, \
+         patch('app.load_qa_chain') as mock_qa, \
+         patch('app.performance_monitor') as mock_monitor:
+
+        mock_retriever = MagicMock()
+        mock_doc = MagicMock()
+        mock_doc.page_content = "SB 9 funds rural hospitals."
+        mock_doc.metadata = {"bill_id": "SB 9", "title": "Rural Hospitals"}
+        mock_retriever.get_relevant_documents = MagicMock(return_value=[mock_doc])
+        mock_vectorstore.as_retriever.return_value = mock_retriever
+
+        mock_chain = MagicMock()
+        mock_chain.ainvoke = AsyncMock(return_value={"output_text": "SB 9 funds rural hospitals."})
+        mock_qa.return_value = mock_chain
+
+        results = await asyncio.gather(
+            rag_query(QueryRequest(query="Rural hospital funding single flight")),
+            rag_query(QueryRequest(query="rural  hospital funding single flight")),
+            rag_query(QueryRequest(query="RURAL HOSPITAL FUNDING SINGLE FLIGHT"))
+        )
+
+    assert mock_chain.ainvoke.await_count == 1
+    assert all(r["documents_found"] == 1 for r in results)
+    # Coalesced followers still show up in the request stats
+    assert mock_monitor.record_request.call_count == 3
+    assert results[1]["query"] == "rural  hospital funding single flight"
 
 class TestRAGSystemEdgeCases:
     """Test edge cases and error conditions"""
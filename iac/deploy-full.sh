@@ -62,7 +62,7 @@ if [[ "$BACKEND_URL" == *"localhost"* ]] || [[ "$BACKEND_URL" == *"your-"* ]]; t
     echo "   - Connect your GitHub repo"
     echo "   - Set Root Directory: backend"
     echo "   - Set Build Command: pip install -r requirements.txt"
-    echo "   - Set Start Command: uvicorn app:app --host 0.0.0.0 --port \$PORT"
+    echo "   - Set Start Command: uvicorn app:app --host 0.0.0.0 --port \$PORT --loop uvloop --http httptools"
     echo
     echo "2. 📝 Update ${ENVIRONMENT}.tfvars with your backend URL"
     echo "3. 🔄 Run this script again"